@@ -1,19 +1,42 @@
 # SPDX-License-Identifier:  AGPL-3.0-or-later
 
-import serial
 import logging
+import sys
+import threading
+
+import transport
+
+
+def parse_data(output):
+    """Decode a raw RLA response into a list of integer samples"""
+    output_str_lst = output[7:-3].decode("ASCII").replace("-", " -").replace("+", " ").split()
+    return [ int(i) for i in output_str_lst ]
+
 
 class HLG1:
     def __init__(self,
                  serial_device = "/dev/ttyUSB0",
                  baud=230400,
-                 id = "01"):
+                 id = "01",
+                 port = None):
         self.cmd_base = "%" + id + "#"
-        try:
-            self.serial = serial.Serial(serial_device, baud, timeout=1)
-        except:
-            print("Failed to connecto to device", serial_device)
-            sys.exit(1)
+
+        self.endpoint = None
+        self.broken = False
+
+        # An already open serial-like object (e.g. hlg1_sim.SimulatedSerial)
+        if port is not None:
+            self.serial = port
+        else:
+            # Local tty, tcp://host:port or rfc2217://host:port, see transport.py
+            try:
+                self.serial = transport.POOL.acquire(serial_device, baud)
+            except (OSError, ValueError):
+                print("Failed to connecto to device", serial_device)
+                sys.exit(1)
+            self.endpoint = (serial_device, baud)
+
+        self.lock = threading.RLock()
 
         logging.info("Connected to " + self.serial.name)
         
@@ -29,18 +52,47 @@ class HLG1:
         logging.debug("Sending:" + cmd_full)
         self.serial.write(cmd_full.encode())
 
-    def rcv_output(self):
-        x = " "
+    def close(self):
+        """
+        Hand the connection back to the pool, keeping it open for the next
+        session; a connection that failed mid-exchange is closed instead
+        """
+        if self.endpoint is not None:
+            if self.broken:
+                transport.POOL.discard(self.endpoint[0], self.endpoint[1], self.serial)
+            else:
+                transport.POOL.release(self.endpoint[0], self.endpoint[1], self.serial)
+            self.endpoint = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.broken = True
+        self.close()
 
+    def rcv_output(self):
+        # Read whole chunks up to the terminator; retry after read timeouts
         result = bytes()
-        while x != b"\r":
-            x = self.serial.read(1)
-            result += x
+        while not result.endswith(b"\r"):
+            result += self.serial.read_until(b"\r")
 
         logging.debug("Received:" + result.decode("ASCII"))
 
         return result
 
+    def transact(self, cmd, sub_cmd="", sub_cmd_chr="+"):
+        """Send a command and receive its response without other threads interleaving"""
+        with self.lock:
+            try:
+                self.snd_cmd(cmd, sub_cmd, sub_cmd_chr)
+                return self.rcv_output()
+            except BaseException:
+                # A reply may be half read, do not reuse the connection
+                self.broken = True
+                raise
+
     def check_error(self, output):
         if output[3:4] == b"!":
             error_code = output[4:6].decode("ASCII")
@@ -77,8 +129,7 @@ class HLG1:
     def get_sampling_cycle(self):
         logging.info("Samplerate= ")
         
-        self.snd_cmd("RSP")
-        output = self.rcv_output()
+        output = self.transact("RSP")
 
         if(self.check_error(output)):
             return 
@@ -100,8 +151,7 @@ class HLG1:
     def get_shutter_time(self):
         logging.info("Shutter time= ")
         
-        self.snd_cmd("RFB")
-        output = self.rcv_output()
+        output = self.transact("RFB")
 
         if(self.check_error(output)):
             return 
@@ -117,8 +167,7 @@ class HLG1:
 
     def get_measurement(self):
         logging.info("Measurement=")
-        self.snd_cmd("RMD")
-        output = self.rcv_output()
+        output = self.transact("RMD")
 
         if(self.check_error(output)):
             return 
@@ -130,8 +179,7 @@ class HLG1:
     def get_buffering_mode(self):
         logging.info("Buffering mode= ")        
         
-        self.snd_cmd("RBD")
-        output = self.rcv_output()
+        output = self.transact("RBD")
 
         if(self.check_error(output)):
             return 
@@ -151,8 +199,7 @@ class HLG1:
         else:
             sub_cmd = "00000"
 
-        self.snd_cmd(cmd, sub_cmd)
-        output = self.rcv_output()
+        output = self.transact(cmd, sub_cmd)
 
         if(self.check_error(output)):
             return 
@@ -161,9 +208,7 @@ class HLG1:
     def get_buffering_operation(self):
         logging.info("Buffering operation= ")
         
-        self.snd_cmd("RBS")
-
-        output = self.rcv_output()
+        output = self.transact("RBS")
         
         if(self.check_error(output)):
             return 
@@ -182,8 +227,7 @@ class HLG1:
         else:
             sub_cmd = "00000"
 
-        self.snd_cmd(cmd, sub_cmd)
-        output = self.rcv_output()
+        output = self.transact(cmd, sub_cmd)
 
         if(self.check_error(output)):
             return 
@@ -192,8 +236,7 @@ class HLG1:
     def get_buffering_status(self):
         logging.info("Buffering status= ")
         
-        self.snd_cmd("RTS")
-        output = self.rcv_output()
+        output = self.transact("RTS")
 
 
         if(self.check_error(output)):
@@ -216,8 +259,7 @@ class HLG1:
     def get_last_datapoint(self):
         logging.info("Last datapoint= ")
 
-        self.snd_cmd("RLD")
-        output = self.rcv_output()
+        output = self.transact("RLD")
 
         logging.info("  " + output[9:13].decode("ASCII"))
 
@@ -227,8 +269,7 @@ class HLG1:
     def get_buffer_rate(self):
         logging.info("Buffer rate= ")
 
-        self.snd_cmd("RBR")
-        output = self.rcv_output()
+        output = self.transact("RBR")
 
         logging.info("  " + str(int(output[8:13].decode("ASCII"))))
 
@@ -237,8 +278,7 @@ class HLG1:
     def get_zero_set(self):
         logging.info("Zero set= ")
 
-        self.snd_cmd("RZS")
-        output = self.rcv_output()
+        output = self.transact("RZS")
 
         logging.info("  " + output[8:13].decode("ASCII"))
 
@@ -248,16 +288,14 @@ class HLG1:
     def set_zero_set(self, set):
         logging.info("Setting zero set to " + str(set))
 
-        self.snd_cmd("WZS", str(set).zfill(5))
-        output = self.rcv_output()
+        output = self.transact("WZS", str(set).zfill(5))
         
         self.check_error(output)
 
     
     def set_buffering_rate(self, rate):
         logging.info("Setting buffer rate to " + str(rate))
-        self.snd_cmd("WBR", str(rate).zfill(5))
-        output = self.rcv_output()
+        output = self.transact("WBR", str(rate).zfill(5))
 
         if(self.check_error(output)):
             return
@@ -265,8 +303,7 @@ class HLG1:
     def get_accumulated_amount(self):
         logging.info("Accumulated amount= ")
 
-        self.snd_cmd("RBC")
-        output = self.rcv_output()
+        output = self.transact("RBC")
 
         logging.info("  " + output[8:13].decode("ASCII"))
 
@@ -276,8 +313,7 @@ class HLG1:
     def set_accumulated_amount(self, amount):
         logging.info("Setting accumulated amount to " + str(amount))
 
-        self.snd_cmd("WBC", str(amount).zfill(5))
-        output = self.rcv_output()
+        output = self.transact("WBC", str(amount).zfill(5))
 
         if(self.check_error(output)):
             return
@@ -285,8 +321,7 @@ class HLG1:
     def get_trigger_point(self):
         logging.info("Trigger point= ")
 
-        self.snd_cmd("RTP")
-        output = self.rcv_output()
+        output = self.transact("RTP")
 
         logging.info("  " + output[8:13].decode("ASCII"))
 
@@ -295,8 +330,7 @@ class HLG1:
     def set_trigger_point(self, point):
         logging.info("Setting trigger point to " + str(point))
 
-        self.snd_cmd("WTP", str(point).zfill(5))
-        output = self.rcv_output()
+        output = self.transact("WTP", str(point).zfill(5))
 
         if(self.check_error(output)):
             return
@@ -304,8 +338,7 @@ class HLG1:
     def get_trigger_delay(self):
         logging.info("Trigger delay= ")
 
-        self.snd_cmd("RTL")
-        output = self.rcv_output()
+        output = self.transact("RTL")
 
         logging.info("  " + output[8:13].decode("ASCII"))
 
@@ -314,8 +347,7 @@ class HLG1:
     def set_trigger_delay(self, delay):
         logging.info("Setting trigger delay to " + str(delay))
 
-        self.snd_cmd("WTL", str(delay).zfill(5))
-        output = self.rcv_output()
+        output = self.transact("WTL", str(delay).zfill(5))
 
         if(self.check_error(output)):
             return
@@ -323,8 +355,7 @@ class HLG1:
     def get_trigger_conditions(self):
         logging.info("Trigger conditions= ")
 
-        self.snd_cmd("RTR")
-        output = self.rcv_output()
+        output = self.transact("RTR")
 
         logging.info("  " + output[8:13].decode("ASCII"))
 
@@ -333,8 +364,7 @@ class HLG1:
     def set_trigger_conditions(self, conditions):
         logging.info("Setting trigger conditions to " + str(conditions))
 
-        self.snd_cmd("WTR", str(conditions).zfill(5))
-        output = self.rcv_output()
+        output = self.transact("WTR", str(conditions).zfill(5))
 
         if(self.check_error(output)):
             return
@@ -342,8 +372,7 @@ class HLG1:
     def get_trigger_threshold(self):
         logging.info("Trigger threshold= ")
 
-        self.snd_cmd("RBL")
-        output = self.rcv_output()
+        output = self.transact("RBL")
 
         logging.info("  " + output[7:15].decode("ASCII"))
 
@@ -353,8 +382,7 @@ class HLG1:
     def set_trigger_threshold(self, threshold):
         logging.info("Setting trigger threshold to " + str(threshold))
 
-        self.snd_cmd("WBL", str(abs(threshold)).zfill(7), "+" if threshold >= 0 else "-")
-        output = self.rcv_output()
+        output = self.transact("WBL", str(abs(threshold)).zfill(7), "+" if threshold >= 0 else "-")
 
         if(self.check_error(output)):
             return
@@ -363,8 +391,7 @@ class HLG1:
     def get_offset(self):
         logging.info("Offset= ")
 
-        self.snd_cmd("RML")
-        output = self.rcv_output()
+        output = self.transact("RML")
 
         logging.info("  " + output[7:15].decode("ASCII"))
 
@@ -374,32 +401,36 @@ class HLG1:
     def set_offset(self, threshold):
         logging.info("Setting offset to " + str(threshold))
 
-        self.snd_cmd("WML", str(abs(threshold)).zfill(7), "+" if threshold >= 0 else "-")
-        output = self.rcv_output()
+        output = self.transact("WML", str(abs(threshold)).zfill(7), "+" if threshold >= 0 else "-")
 
         if(self.check_error(output)):
             return
 
 
         
-    def read_data(self):
+    def read_data_raw(self, start=1, end=None):
         logging.info("Setting read data")
         
+        with self.lock:
+            if end is None:
+                end = self.get_last_datapoint()
 
-        samples = self.get_last_datapoint()
-
-        start_str = str(1).zfill(5)
-        end_str   = str(samples).zfill(5)
-        self.snd_cmd("RLA",start_str+end_str,"")
-
-        output = self.rcv_output()
+            start_str = str(start).zfill(5)
+            end_str   = str(end).zfill(5)
+            output = self.transact("RLA",start_str+end_str,"")
         
         if(self.check_error(output)):
             return
 
-        output_str_lst = output[8:-3].decode("ASCII").replace("-", " -").replace("+", " ").split(" ")
-        output_int_lst = [ int(i) for i in output_str_lst ]
+        return output
+
+    def read_data(self, start=1, end=None):
+        output = self.read_data_raw(start, end)
+
+        if output is None:
+            return
 
+        output_int_lst = parse_data(output)
         
         logging.info("  all data received ")
 
@@ -410,8 +441,7 @@ class HLG1:
 
     def get_digital_output_alarm(self):
         logging.info("Getting Digital Output at Alarm= ")
-        self.snd_cmd("RAD")
-        output = self.rcv_output()
+        output = self.transact("RAD")
 
         logging.info("  " + output[8:13].decode("ASCII"))
 
@@ -420,15 +450,13 @@ class HLG1:
     def set_digital_output_alarm(self, set):
         logging.info("Setting Digital Output at Alarm " + str(set))
 
-        self.snd_cmd("WAD", str(set).zfill(5))
-        output = self.rcv_output()
+        output = self.transact("WAD", str(set).zfill(5))
         
         self.check_error(output)
 
     def get_alarm_delay_time(self):
         logging.info("Getting Alarm Delay Time= ")
-        self.snd_cmd("RHC")
-        output = self.rcv_output()
+        output = self.transact("RHC")
 
         logging.info("  " + output[8:13].decode("ASCII"))
 
@@ -437,16 +465,14 @@ class HLG1:
     def set_alarm_delay_time(self, set):
         logging.info("Setting Alarm Delay Time" + str(set))
 
-        self.snd_cmd("WHC", str(set).zfill(5))
-        output = self.rcv_output()
+        output = self.transact("WHC", str(set).zfill(5))
         
         self.check_error(output)
 
 
     def get_alarm_status(self):
         logging.info("Getting Alarm status= ")
-        self.snd_cmd("ROA")
-        output = self.rcv_output()
+        output = self.transact("ROA")
 
         logging.info("  " + output[8:13].decode("ASCII"))
 
@@ -454,8 +480,7 @@ class HLG1:
 
     def get_all_outputs_read(self):
         logging.info("Getting all Outputs read= ")
-        self.snd_cmd("RMB")
-        output = self.rcv_output()
+        output = self.transact("RMB")
 
         logging.info("  " + output[8:13].decode("ASCII"))
 
@@ -464,8 +489,7 @@ class HLG1:
 
     def get_timing_mode(self):
         logging.info("Getting Timing mode= ")
-        self.snd_cmd("RTM")
-        output = self.rcv_output()
+        output = self.transact("RTM")
 
         logging.info("  " + output[8:13].decode("ASCII"))
 
@@ -474,15 +498,13 @@ class HLG1:
     def set_timing_mode(self, set):
         logging.info("Setting Timing mode " + str(set))
 
-        self.snd_cmd("WTM", str(set).zfill(5))
-        output = self.rcv_output()
+        output = self.transact("WTM", str(set).zfill(5))
         
         self.check_error(output)
 
     def get_timing_input(self):
         logging.info("Getting Timing Input= ")
-        self.snd_cmd("RTI")
-        output = self.rcv_output()
+        output = self.transact("RTI")
 
         logging.info("  " + output[8:13].decode("ASCII"))
 
@@ -491,8 +513,7 @@ class HLG1:
     def set_timing_input(self, set):
         logging.info("Setting Timing Input " + str(set))
 
-        self.snd_cmd("WTI", str(set).zfill(5))
-        output = self.rcv_output()
+        output = self.transact("WTI", str(set).zfill(5))
         
         self.check_error(output)
 
@@ -0,0 +1,386 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Benchmark Suite
+Measures the protocol, parsing and acquisition paths against the in-process
+simulator (hlg1_sim.py), saves the results as JSON and compares them with a
+stored baseline
+
+    python bench.py -o results.json
+    python bench.py -o results.json --baseline baseline.json
+
+Every metric is a time or size (lower is better) except names ending in
+"_per_s" or "_ratio". Host time is the CPU-side cost measured on this machine; wire time
+is the simulated serial transfer time at the given baud rate.
+"""
+
+import argparse
+import inspect
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from HLG1 import HLG1, parse_data
+from hlg1_sim import SimulatedSerial
+
+BAUD_RATES = (9600, 38400, 115200, 230400)
+PARSE_SIZES = (1, 10, 100, 1000, 3000)
+
+# Arguments used for set_* commands
+SET_ARGS = {
+    "set_buffering_mode": (True,),
+    "set_buffering_operation": (False,),
+}
+
+
+def _timeit(func, repeat):
+    """Median wall time of func() over repeat runs"""
+    runs = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - t)
+    return statistics.median(runs)
+
+
+def _device(baud=230400):
+    port = SimulatedSerial(baud=baud)
+    return HLG1(port=port), port
+
+
+def _commands():
+    names = []
+    for name, func in inspect.getmembers(HLG1, inspect.isfunction):
+        if name.startswith(("get_", "set_")):
+            names.append(name)
+    return names
+
+
+def bench_commands(repeat):
+    """Per-command round trip: host time and simulated wire time at 230400"""
+    results = {}
+    for name in _commands():
+        hlg, port = _device()
+        args = SET_ARGS.get(name, (0,) if name.startswith("set_") else ())
+        method = getattr(hlg, name)
+
+        host = _timeit(lambda: method(*args), repeat)
+
+        port.wire_time = 0.0
+        method(*args)
+        results[name] = {"host_s": host, "wire_s": port.wire_time}
+    return results
+
+
+def bench_rcv_output(repeat):
+    """rcv_output throughput on a full 3000 sample RLA response"""
+    hlg, port = _device()
+    reply = port.rla_reply()
+
+    def run():
+        port.feed(reply)
+        hlg.rcv_output()
+
+    t = _timeit(run, repeat)
+    return {"bytes": len(reply), "host_s": t, "bytes_per_s": len(reply) / t}
+
+
+def bench_parse(repeat):
+    """parse_data time for buffers of 1 to 3000 samples"""
+    results = {}
+    for n in PARSE_SIZES:
+        _, port = _device()
+        reply = port.rla_reply(n)
+        t = _timeit(lambda: parse_data(reply), repeat)
+        results[str(n)] = {"host_s": t, "samples_per_s": n / t}
+    return results
+
+
+def bench_cycle(repeat):
+    """configure + trigger + readout through the CLI commands, per baud rate"""
+    import tempfile
+    from hlg1_cli import Context, build_parser, cmd_configure, cmd_trigger, cmd_readout
+
+    argp = build_parser()
+    tmp = tempfile.mkdtemp(prefix="hlg1-bench-")
+    out = os.path.join(tmp, "output_data.txt")
+    configure = argp.parse_args(["configure"])
+    trigger = argp.parse_args(["trigger"])
+    readout = argp.parse_args(["readout", out])
+
+    results = {}
+    for baud in BAUD_RATES:
+        host = []
+        wire = []
+        for _ in range(repeat):
+            ctx = Context()
+            ctx._hlg, port = _device(baud)
+
+            t = time.perf_counter()
+            with _quiet():
+                cmd_configure(ctx, configure)
+                cmd_trigger(ctx, trigger)
+                cmd_readout(ctx, readout)
+            host.append(time.perf_counter() - t)
+            wire.append(port.wire_time)
+
+        results[str(baud)] = {
+            "host_s": statistics.median(host),
+            "wire_s": statistics.median(wire),
+            "total_s": statistics.median(host) + statistics.median(wire),
+        }
+
+    for name in os.listdir(tmp):
+        os.remove(os.path.join(tmp, name))
+    os.rmdir(tmp)
+    return results
+
+
+def bench_codec(repeat):
+    """capture_codec size and throughput on simulated and long smooth traces"""
+    import numpy as np
+    import capture_codec
+    from hlg1_sim import waveform
+
+    t = np.arange(1000000)
+    traces = {
+        "sim3000": np.array(waveform(3000), dtype=np.int32),
+        "smooth1M": (250000 * np.sin(t / 150.0)).astype(np.int32),
+    }
+
+    results = {}
+    for name, x in traces.items():
+        text = sum(len(f"{v}\n") for v in x[:100000]) * len(x) / min(len(x), 100000)
+        for compression in (None, "zlib", "lzma"):
+            data = capture_codec.encode(x, compression=compression)
+            enc = _timeit(lambda: capture_codec.encode(x, compression=compression), max(1, repeat // 10))
+            dec = _timeit(lambda: capture_codec.decode(data), max(1, repeat // 10))
+            results[f"{name}.{compression or 'raw'}"] = {
+                "bytes": len(data),
+                "text_ratio": text / len(data),
+                "encode_samples_per_s": len(x) / enc,
+                "decode_samples_per_s": len(x) / dec,
+            }
+    return results
+
+
+def bench_detectors(repeat):
+    """Detector throughput on a 1M sample trace with steps, per block size"""
+    import numpy as np
+    from detectors import Threshold, Step, Peak, Tolerance
+
+    rng = np.random.default_rng(0)
+    t = np.arange(1000000)
+    # Parts passing under the head: flat levels with steps, slow drift and noise
+    x = 100000 * ((t // 50000) % 2) + 2000 * np.sin(t / 15000.0) + rng.normal(0, 50, len(t))
+
+    make = {
+        "threshold": lambda: Threshold(60000, 40000),
+        "step": lambda: Step(drift=500, threshold=20000),
+        "peak": lambda: Peak(height=50000, distance=100),
+        "tolerance": lambda: Tolerance(-5000, 105000, window=25),
+    }
+
+    results = {}
+    for block in (100, 3000):
+        for name, factory in make.items():
+            def run():
+                d = factory()
+                for i in range(0, len(x), block):
+                    d.process(x[i:i + block])
+            results[f"{name}.{block}"] = {"samples_per_s": len(x) / _timeit(run, max(1, repeat // 10))}
+    return results
+
+
+def bench_startup(repeat):
+    """
+    Wall time of hlg1 invocations in a fresh interpreter: --help, and trigger
+    and readout against the simulator served over TCP, which include the
+    imports those subcommands pull in
+    """
+    import tempfile
+    import threading
+    import hlg1_cli
+    from hlg1_sim import SimulatorServer
+
+    server = SimulatorServer(("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    device = f"tcp://127.0.0.1:{server.server_address[1]}"
+
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Fill the buffer once, readout leaves it filled
+            with _quiet():
+                hlg1_cli.main(["-q", "-d", device, "configure", "+", "trigger"])
+
+            commands = {
+                "help": ["--help"],
+                "trigger": ["-q", "-d", device, "trigger"],
+                "readout": ["-q", "-d", device, "readout", os.path.join(tmp, "out.txt")],
+            }
+            for name, argv in commands.items():
+                runs = []
+                for _ in range(repeat):
+                    t = time.perf_counter()
+                    subprocess.run([sys.executable, hlg1_cli.__file__] + argv,
+                                   stdout=subprocess.DEVNULL, check=True)
+                    runs.append(time.perf_counter() - t)
+                results[name] = {"median_s": statistics.median(runs), "min_s": min(runs)}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return results
+
+
+class _quiet:
+    """Silence stdout and info logging of the CLI commands"""
+
+    def __enter__(self):
+        import io
+        self.stdout = sys.stdout
+        self.level = logging.getLogger().level
+        sys.stdout = io.StringIO()
+        logging.getLogger().setLevel(logging.WARNING)
+
+    def __exit__(self, *exc):
+        sys.stdout = self.stdout
+        logging.getLogger().setLevel(self.level)
+
+
+def bench_convert(repeat):
+    """Legacy text file parsing: convert.parse_text against reading line by line"""
+    import numpy as np
+    from convert import parse_text
+    from hlg1_sim import waveform
+
+    results = {}
+    for n in (3000, 1000000):
+        x = np.resize(np.array(waveform(3000), dtype=np.int32), n)
+        data = "".join(f"{v}\n" for v in x).encode()
+        t = _timeit(lambda: parse_text(data), max(1, repeat // 10))
+        lines = _timeit(lambda: [int(line) for line in data.splitlines()], max(1, repeat // 10))
+        results[str(n)] = {
+            "samples_per_s": n / t,
+            "mb_per_s": len(data) / 1e6 / t,
+            "speedup_ratio": lines / t,
+        }
+    return results
+
+
+SUITES = {
+    "commands": bench_commands,
+    "rcv_output": bench_rcv_output,
+    "parse": bench_parse,
+    "cycle": bench_cycle,
+    "codec": bench_codec,
+    "detectors": bench_detectors,
+    "convert": bench_convert,
+    "startup": bench_startup,
+}
+
+
+def run(suites=None, repeat=20):
+    """Run the named suites (default: all) and return the results dict"""
+    level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        results = {}
+        for name in suites or SUITES:
+            print(f"Running {name}", file=sys.stderr)
+            results[name] = SUITES[name](repeat if name != "cycle" else max(1, repeat // 10))
+    finally:
+        logging.getLogger().setLevel(level)
+
+    return {
+        "meta": {
+            "time": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}"""
+    flat = {}
+    for k, v in results.items():
+        key = prefix + k
+        if isinstance(v, dict):
+            flat.update(flatten(v, key + "."))
+        elif isinstance(v, (int, float)):
+            flat[key] = v
+    return flat
+
+
+def compare(current, baseline, threshold=0.2):
+    """
+    List metrics that got worse by more than threshold (relative)
+    Returns [(name, baseline, current, change)]
+    """
+    cur = flatten(current["results"])
+    base = flatten(baseline["results"])
+
+    regressions = []
+    for name, old in base.items():
+        new = cur.get(name)
+        if new is None or not old:
+            continue
+
+        if name.endswith(("_per_s", "_ratio")):
+            change = old / new - 1 if new else float("inf")
+        else:
+            change = new / old - 1
+
+        if change > threshold:
+            regressions.append((name, old, new, change))
+    return regressions
+
+
+def main(argv=None):
+    logging.basicConfig(
+        format='%(asctime)s %(levelname)-8s %(message)s',
+        level=logging.INFO,
+        datefmt='%Y-%m-%d %H:%M:%S')
+
+    argp = argparse.ArgumentParser(description="Benchmark HL-G1 protocol and acquisition paths")
+    argp.add_argument("-o", "--output", help="Write results as JSON to this file")
+    argp.add_argument("--baseline", help="Compare against results stored in this file")
+    argp.add_argument("--threshold", default=0.2, type=float,
+                      help="Relative slowdown reported as regression (default: 0.2)")
+    argp.add_argument("-r", "--repeat", default=20, type=int, help="Runs per measurement (default: 20)")
+    argp.add_argument("-s", "--suite", action="append", choices=sorted(SUITES),
+                      help="Only run this suite (repeatable)")
+    args = argp.parse_args(argv)
+
+    results = run(args.suite, args.repeat)
+
+    for name, value in sorted(flatten(results["results"]).items()):
+        print(f"{name:55s} {value:.6g}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:.6g} -> {new:.6g} ({change:+.0%})")
+        if regressions:
+            return 1
+        print("No regressions")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
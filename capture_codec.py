@@ -0,0 +1,275 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Capture Codec
+Compact storage for int32 displacement samples: delta or delta-of-delta
+encoding, zigzag varint packing and optional zlib/lzma per chunk
+
+File layout:
+    header  b"HLGC", version (u8), order (u8: 1 delta, 2 delta-of-delta),
+            compression (u8: 0 none, 1 zlib, 2 lzma), reserved (u8)
+    chunk   samples (u32 LE), payload length (u32 LE), payload
+    ...
+
+Every chunk starts its deltas from zero, so chunks decode independently and
+a stream can be encoded and decoded chunk by chunk.
+"""
+
+import io
+import lzma
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b"HLGC"
+VERSION = 1
+
+DELTA = 1
+DELTA_OF_DELTA = 2
+
+COMPRESSIONS = {
+    None: 0,
+    "zlib": 1,
+    "lzma": 2,
+}
+
+_HEADER = struct.Struct("<4sBBBB")
+_CHUNK = struct.Struct("<II")
+
+DEFAULT_CHUNK = 65536
+
+
+# --------------------------
+# Vectorized primitives
+# --------------------------
+
+def delta(x, order=DELTA):
+    """Deltas of int64 x, starting from zero, applied order times"""
+    d = np.asarray(x, dtype=np.int64)
+    for _ in range(order):
+        d = np.diff(d, prepend=np.int64(0))
+    return d
+
+
+def undelta(d, order=DELTA):
+    x = np.asarray(d, dtype=np.int64)
+    for _ in range(order):
+        x = np.cumsum(x)
+    return x
+
+
+def zigzag(v):
+    v = np.asarray(v, dtype=np.int64)
+    return ((v << 1) ^ (v >> 63)).view(np.uint64)
+
+
+def unzigzag(u):
+    u = np.asarray(u, dtype=np.uint64)
+    return (u >> np.uint64(1)).view(np.int64) ^ -(u & np.uint64(1)).view(np.int64)
+
+
+def varint_pack(u):
+    """LEB128 bytes of the uint64 values in u"""
+    u = np.asarray(u, dtype=np.uint64)
+    if not len(u):
+        return b""
+
+    nbytes = np.ones(len(u), dtype=np.int64)
+    for k in range(1, 10):
+        nbytes += u >= np.uint64(1 << (7 * k))
+
+    offsets = np.cumsum(nbytes) - nbytes
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+
+    for k in range(int(nbytes.max())):
+        sel = nbytes > k
+        byte = (u[sel] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (nbytes[sel] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[offsets[sel] + k] = (byte | more).astype(np.uint8)
+
+    return out.tobytes()
+
+
+def varint_unpack(data):
+    """uint64 values from LEB128 bytes"""
+    b = np.frombuffer(data, dtype=np.uint8)
+    if not len(b):
+        return np.zeros(0, dtype=np.uint64)
+
+    last = b < 0x80
+    if not last[-1]:
+        raise ValueError("truncated varint")
+
+    ends = np.flatnonzero(last)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    group = np.repeat(np.arange(len(starts)), ends - starts + 1)
+    shift = (np.arange(len(b)) - starts[group]) * 7
+
+    contrib = (b & 0x7F).astype(np.uint64) << shift.astype(np.uint64)
+    return np.add.reduceat(contrib, starts)
+
+
+def encode_block(samples, order=DELTA):
+    return varint_pack(zigzag(delta(samples, order)))
+
+
+def decode_block(data, order=DELTA):
+    return undelta(unzigzag(varint_unpack(data)), order).astype(np.int32)
+
+
+def _compress(payload, compression):
+    if compression == "zlib":
+        return zlib.compress(payload, 6)
+    if compression == "lzma":
+        return lzma.compress(payload, preset=6)
+    return payload
+
+
+def _decompress(payload, compression):
+    if compression == "zlib":
+        return zlib.decompress(payload)
+    if compression == "lzma":
+        return lzma.decompress(payload)
+    return payload
+
+
+# --------------------------
+# Streaming
+# --------------------------
+
+class Encoder:
+    """
+    Streaming writer; also usable as a pipeline sink
+    Args:
+        f:           path or binary file object
+        order:       DELTA or DELTA_OF_DELTA (default, smaller on smooth traces)
+        compression: None, "zlib" or "lzma"
+        chunk_size:  samples per chunk
+    """
+
+    def __init__(self, f, order=DELTA_OF_DELTA, compression="zlib", chunk_size=DEFAULT_CHUNK):
+        if order not in (DELTA, DELTA_OF_DELTA):
+            raise ValueError("Unknown delta order " + str(order))
+        if compression not in COMPRESSIONS:
+            raise ValueError("Unknown compression " + str(compression))
+
+        self.owns = isinstance(f, str)
+        self.f = open(f, "wb") if self.owns else f
+        self.order = order
+        self.compression = compression
+        self.chunk_size = chunk_size
+
+        self._pending = []
+        self._pending_n = 0
+        self.samples = 0
+        self.bytes = _HEADER.size
+
+        self.f.write(_HEADER.pack(MAGIC, VERSION, order, COMPRESSIONS[compression], 0))
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.int32)
+        self._pending.append(samples)
+        self._pending_n += len(samples)
+
+        if self._pending_n >= self.chunk_size:
+            data = np.concatenate(self._pending)
+            n = len(data) - len(data) % self.chunk_size
+            for i in range(0, n, self.chunk_size):
+                self._write_chunk(data[i:i + self.chunk_size])
+            self._pending = [data[n:]]
+            self._pending_n = len(data) - n
+
+    def flush(self):
+        if self._pending_n:
+            self._write_chunk(np.concatenate(self._pending))
+        self._pending = []
+        self._pending_n = 0
+        self.f.flush()
+
+    def close(self):
+        self.flush()
+        if self.owns:
+            self.f.close()
+
+    def _write_chunk(self, samples):
+        payload = _compress(encode_block(samples, self.order), self.compression)
+        self.f.write(_CHUNK.pack(len(samples), len(payload)))
+        self.f.write(payload)
+        self.samples += len(samples)
+        self.bytes += _CHUNK.size + len(payload)
+
+
+class Decoder:
+    """Iterates over the chunks of an encoded stream as int32 arrays"""
+
+    def __init__(self, f):
+        self.owns = isinstance(f, str)
+        self.f = open(f, "rb") if self.owns else f
+
+        magic, version, order, compression, _ = _HEADER.unpack(self.f.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("not an HL-G1 capture stream")
+        if version != VERSION:
+            raise ValueError("unsupported capture stream version " + str(version))
+
+        self.order = order
+        self.compression = {v: k for k, v in COMPRESSIONS.items()}[compression]
+
+    def __iter__(self):
+        while True:
+            head = self.f.read(_CHUNK.size)
+            if not head:
+                break
+            if len(head) < _CHUNK.size:
+                raise ValueError("truncated chunk header")
+
+            n, length = _CHUNK.unpack(head)
+            payload = self.f.read(length)
+            if len(payload) < length:
+                raise ValueError("truncated chunk")
+
+            samples = decode_block(_decompress(payload, self.compression), self.order)
+            if len(samples) != n:
+                raise ValueError("chunk sample count mismatch")
+            yield samples
+
+    def read_all(self):
+        chunks = list(self)
+        if not chunks:
+            return np.zeros(0, dtype=np.int32)
+        return np.concatenate(chunks)
+
+    def close(self):
+        if self.owns:
+            self.f.close()
+
+
+# --------------------------
+# Whole captures
+# --------------------------
+
+def encode(samples, order=DELTA_OF_DELTA, compression="zlib", chunk_size=DEFAULT_CHUNK):
+    buf = io.BytesIO()
+    enc = Encoder(buf, order, compression, chunk_size)
+    enc.write(samples)
+    enc.flush()
+    return buf.getvalue()
+
+
+def decode(data):
+    return Decoder(io.BytesIO(data)).read_all()
+
+
+def save(path, samples, order=DELTA_OF_DELTA, compression="zlib"):
+    enc = Encoder(path, order, compression)
+    enc.write(samples)
+    enc.close()
+
+
+def load(path):
+    dec = Decoder(path)
+    try:
+        return dec.read_all()
+    finally:
+        dec.close()
@@ -0,0 +1,256 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Bulk Converter
+Converts directories of readout text files (one measurement per line, as
+written by readout_buffer_over_serial.py) into compressed .hlgc captures
+(capture_codec.py), using a pool of worker processes
+
+    python convert.py old_runs/ -o converted/
+    hlg1 convert old_runs/ -o converted/ -j 8
+
+The output tree mirrors the input tree, each source directory under its own
+name (converted/old_runs/... above; a file given directly goes under the name
+of its directory). Two sources that still map to the same output are
+refused before anything is written. Every capture gets a <name>.hlgc.json
+sidecar (schema in timebase.py) with the timebase of the source's sidecar,
+if it had one, and the metadata recovered from the file name, and one line
+in converted/index.jsonl. Files listed in the index with unchanged size and
+modification time are skipped, so an interrupted conversion continues where
+it stopped.
+"""
+
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import re
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+import capture_codec
+from timebase import read_sidecar, write_sidecar
+
+INDEX = "index.jsonl"
+
+# 20240131, 2024-01-31, 2024_01_31, optionally followed by a time of day
+_DATE = re.compile(r"(?<!\d)(\d{4})[-_]?(\d{2})[-_]?(\d{2})"
+                   r"(?:[T_ -]?(\d{2})[-_:.h]?(\d{2})[-_:.m]?(\d{2})?)?(?!\d)")
+
+
+def parse_text(data):
+    """int32 samples from the bytes of a readout text file"""
+    with warnings.catch_warnings():
+        # Text that is not a number raises in NumPy 2, older versions only warn
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            x = np.fromstring(data, dtype=np.int64, sep=" ")
+        except (DeprecationWarning, ValueError):
+            raise ValueError("not a readout text file") from None
+
+    if len(x) and (x.min() < np.iinfo(np.int32).min or x.max() > np.iinfo(np.int32).max):
+        raise ValueError("value out of int32 range")
+    return x.astype(np.int32)
+
+
+def filename_metadata(path):
+    """Recording time found in the file or directory names, as ISO string"""
+    for m in reversed(list(_DATE.finditer(path))):
+        y, mo, d, h, mi, s = (int(g) if g else 0 for g in m.groups())
+        try:
+            return {"recorded": datetime(y, mo, d, h, mi, s).isoformat(), "recorded_from": "filename"}
+        except ValueError:
+            continue
+    return {}
+
+
+def convert_file(src, dst, rel, order=capture_codec.DELTA_OF_DELTA, compression="zlib"):
+    """Convert one file; returns its index entry"""
+    st = os.stat(src)
+    entry = {"source": rel, "size": st.st_size, "mtime": st.st_mtime}
+
+    with open(src, "rb") as f:
+        samples = parse_text(f.read())
+
+    meta = {"source": rel}
+    meta.update(filename_metadata(rel))
+
+    timebase = None
+    if os.path.exists(src + ".json"):
+        timebase, _ = read_sidecar(src)
+        if timebase is not None and timebase.anchor:
+            meta["recorded"] = datetime.fromtimestamp(timebase.anchor).isoformat()
+            meta["recorded_from"] = "anchor"
+    if "recorded" not in meta:
+        meta["recorded"] = datetime.fromtimestamp(st.st_mtime).isoformat()
+        meta["recorded_from"] = "mtime"
+
+    # Written under a temporary name, so an interrupted file is redone next time
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    enc = capture_codec.Encoder(dst + ".part", order, compression)
+    enc.write(samples)
+    enc.close()
+    write_sidecar(dst, timebase, **meta)
+    os.replace(dst + ".part", dst)
+
+    entry.update(output=os.path.splitext(rel)[0] + ".hlgc", samples=len(samples), bytes=enc.bytes,
+                 recorded=meta["recorded"])
+    return entry
+
+
+def find_sources(roots, pattern="*.txt"):
+    """
+    (path, key) of every file matching pattern below roots; the key is the
+    path relative to the root's parent, so it starts with the root's name
+    """
+    for root in roots:
+        root = os.path.abspath(root)
+        if os.path.isfile(root):
+            parent = os.path.dirname(root)
+            yield root, os.path.join(os.path.basename(parent), os.path.basename(root))
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(fnmatch.filter(filenames, pattern)):
+                path = os.path.join(dirpath, name)
+                yield path, os.path.relpath(path, os.path.dirname(root))
+
+
+def load_index(path):
+    """Completed entries by source, last one wins"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue    # torn last line of an interrupted run
+            done[entry["source"]] = entry
+    return done
+
+
+def convert(roots, output, workers=None, pattern="*.txt",
+            order=capture_codec.DELTA_OF_DELTA, compression="zlib"):
+    """
+    Convert every matching file below roots into output
+    Returns stats with files, bytes, seconds, files_per_s, mb_per_s, skipped and failed
+    """
+    os.makedirs(output, exist_ok=True)
+    index_path = os.path.join(output, INDEX)
+    done = load_index(index_path)
+
+    todo = []
+    skipped = 0
+    targets = {}
+    for src, rel in find_sources(roots, pattern):
+        dst = os.path.join(output, os.path.splitext(rel)[0] + ".hlgc")
+        if dst in targets:
+            raise ValueError(f"{targets[dst]} and {src} would both be written to {dst}")
+        targets[dst] = src
+
+        st = os.stat(src)
+        old = done.get(rel)
+        if (old and old["size"] == st.st_size and old["mtime"] == st.st_mtime
+                and os.path.exists(dst)):
+            skipped += 1
+            continue
+        todo.append((src, dst, rel))
+
+    logging.info(f"{len(todo)} files to convert, {skipped} already done")
+
+    stats = {"files": 0, "bytes": 0, "samples": 0, "skipped": skipped, "failed": 0}
+    start = last_report = time.perf_counter()
+
+    with open(index_path, "a") as index, ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(convert_file, src, dst, rel, order, compression): rel
+                   for src, dst, rel in todo}
+        try:
+            for future in as_completed(futures):
+                rel = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    logging.warning(f"{rel}: {e}")
+                    stats["failed"] += 1
+                    continue
+
+                index.write(json.dumps(entry) + "\n")
+                index.flush()
+
+                stats["files"] += 1
+                stats["bytes"] += entry["size"]
+                stats["samples"] += entry["samples"]
+                if time.perf_counter() - last_report > 5:
+                    last_report = time.perf_counter()
+                    logging.info(f"{stats['files']}/{len(todo)} files")
+        except KeyboardInterrupt:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    stats["seconds"] = time.perf_counter() - start
+    elapsed = max(stats["seconds"], 1e-9)
+    stats["files_per_s"] = stats["files"] / elapsed
+    stats["mb_per_s"] = stats["bytes"] / 1e6 / elapsed
+    return stats
+
+
+def main(argv=None):
+    logging.basicConfig(
+        format='%(asctime)s %(levelname)-8s %(message)s',
+        level=logging.INFO,
+        datefmt='%Y-%m-%d %H:%M:%S')
+
+    argp = argparse.ArgumentParser(description="Convert readout text files to .hlgc captures")
+    argp.add_argument("sources",
+                      nargs="+",
+                      help="Directories or files to convert")
+    argp.add_argument("-o", "--output",
+                      required=True,
+                      help="Output directory")
+    argp.add_argument("-j", "--jobs",
+                      type=int,
+                      help="Worker processes (default: number of CPUs)")
+    argp.add_argument("--pattern",
+                      default="*.txt",
+                      help="File name pattern in directories (default: *.txt)")
+    argp.add_argument("--compression",
+                      default="zlib",
+                      choices=["none", "zlib", "lzma"],
+                      help="Compression of the captures (default: zlib)")
+    argp.add_argument("--delta",
+                      action="store_true",
+                      help="Plain delta instead of delta-of-delta encoding")
+    args = argp.parse_args(argv)
+
+    order = capture_codec.DELTA if args.delta else capture_codec.DELTA_OF_DELTA
+    compression = None if args.compression == "none" else args.compression
+
+    try:
+        stats = convert(args.sources, args.output, args.jobs, args.pattern, order, compression)
+    except KeyboardInterrupt:
+        logging.warning("Interrupted, run again to continue")
+        return 130
+    except ValueError as e:
+        logging.error(e)
+        return 1
+
+    logging.info(f"Converted {stats['files']} files ({stats['samples']} samples, "
+                 f"{stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']:.2f} s: "
+                 f"{stats['files_per_s']:.1f} files/s, {stats['mb_per_s']:.1f} MB/s")
+    if stats["skipped"]:
+        logging.info(f"Skipped {stats['skipped']} files converted earlier")
+    if stats["failed"]:
+        logging.warning(f"{stats['failed']} files failed, they are retried on the next run")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Online Event Detection
+Streaming detectors fed block by block from live or buffered data. Each block
+is processed with vectorized NumPy and the state carried between blocks is a
+handful of scalars (the rolling tolerance detector also keeps its window).
+
+    detectors = [Threshold(5000, 4000), Step(drift=50, threshold=20000)]
+    sink = DetectorSink(detectors, print, timebase=capture.timebase)
+    Pipeline(source, parse_data, [sink]).run()
+
+Events carry the global sample index and, with a timebase, its time.
+"""
+
+import numpy as np
+
+
+class Event:
+
+    def __init__(self, kind, index, value, time=None, **info):
+        self.kind = kind
+        self.index = index
+        self.value = value
+        self.time = time
+        self.info = info
+
+    def __repr__(self):
+        extra = "".join(f", {k}={v!r}" for k, v in self.info.items())
+        return f"Event({self.kind!r}, index={self.index}, value={self.value}, time={self.time}{extra})"
+
+
+class Detector:
+    """Base class: tracks the global sample index and timestamps events"""
+
+    kind = "event"
+
+    def __init__(self, timebase=None):
+        self.timebase = timebase
+        self.count = 0
+
+    def process(self, block):
+        """Consume a block of samples, return the events found in it"""
+        x = np.asarray(block, dtype=np.float64)
+        if not len(x):
+            return []
+        events = self._process(x)
+        self.count += len(x)
+        return events
+
+    def _event(self, i, value, **info):
+        index = self.count + int(i)
+        time = None
+        if self.timebase is not None:
+            time = self.timebase.start + index * self.timebase.step
+        return Event(self.kind, index, float(value), time, **info)
+
+    def _process(self, x):
+        raise NotImplementedError
+
+
+class Threshold(Detector):
+    """
+    Threshold with hysteresis: "rise" when the signal reaches high, "fall"
+    when it drops to low again
+    """
+
+    kind = "threshold"
+
+    def __init__(self, high, low=None, timebase=None):
+        super().__init__(timebase)
+        self.high = high
+        self.low = high if low is None else low
+        if self.low > self.high:
+            raise ValueError("low must not exceed high")
+        self.above = None
+
+    def _process(self, x):
+        up = x >= self.high
+        down = x <= self.low
+
+        # State after every sample: last decisive sample wins, else carry over
+        decisive = up | down
+        idx = np.where(decisive, np.arange(len(x)), -1)
+        np.maximum.accumulate(idx, out=idx)
+
+        state = np.empty(len(x), dtype=np.int8)
+        known = idx >= 0
+        state[known] = up[idx[known]]
+        state[~known] = -1 if self.above is None else self.above
+
+        prev = np.concatenate(([-1 if self.above is None else self.above], state[:-1]))
+        changes = np.flatnonzero((state != prev) & (state >= 0) & (prev >= 0))
+
+        if state[-1] >= 0:
+            self.above = int(state[-1])
+
+        return [self._event(i, x[i], edge="rise" if state[i] else "fall") for i in changes]
+
+
+class Step(Detector):
+    """
+    Two-sided CUSUM step/edge detector
+    Alarms when the cumulative deviation from the reference level, less drift
+    per sample, exceeds threshold; the reference then moves to the new level
+    Args:
+        drift:      allowed deviation per sample (k)
+        threshold:  decision threshold (h)
+        level:      initial reference level (default: first sample)
+    """
+
+    kind = "step"
+
+    def __init__(self, drift, threshold, level=None, timebase=None):
+        super().__init__(timebase)
+        self.drift = drift
+        self.threshold = threshold
+        self.level = level
+        self.pos = 0.0
+        self.neg = 0.0
+
+    def _process(self, x):
+        if self.level is None:
+            self.level = x[0]
+
+        events = []
+        offset = 0
+        # Look ahead in growing windows so each alarm only costs the samples up to it
+        span = 256
+        while offset < len(x):
+            seg = x[offset:offset + span]
+
+            # g_n = S_n - min(S_0..S_n) is the CUSUM recursion max(0, g + d)
+            s = self.pos + np.cumsum(seg - self.level - self.drift)
+            g_pos = s - np.minimum(np.minimum.accumulate(s), 0)
+            s = self.neg + np.cumsum(self.level - seg - self.drift)
+            g_neg = s - np.minimum(np.minimum.accumulate(s), 0)
+
+            alarm = np.flatnonzero((g_pos > self.threshold) | (g_neg > self.threshold))
+            if not len(alarm):
+                self.pos = g_pos[-1]
+                self.neg = g_neg[-1]
+                offset += len(seg)
+                span *= 2
+                continue
+
+            i = alarm[0]
+            direction = 1 if g_pos[i] > self.threshold else -1
+            events.append(self._event(offset + i, seg[i], direction=direction,
+                                      level=float(self.level)))
+
+            self.level = seg[i]
+            self.pos = 0.0
+            self.neg = 0.0
+            offset += i + 1
+            span = 256
+
+        return events
+
+
+class Peak(Detector):
+    """
+    Local maxima ("max") and/or minima ("min") of the signal
+    Args:
+        height:   maxima must reach it, minima must not exceed it (optional)
+        distance: minimum number of samples between reported peaks
+        mode:     "max", "min" or "both"
+    """
+
+    kind = "peak"
+
+    def __init__(self, height=None, distance=1, mode="max", timebase=None):
+        super().__init__(timebase)
+        if mode not in ("max", "min", "both"):
+            raise ValueError("mode must be max, min or both")
+        self.height = height
+        self.distance = distance
+        self.mode = mode
+
+        self.last = None
+        self.slope = 0
+        self.last_peak = None
+
+    def _process(self, x):
+        prev = x[0] if self.last is None else self.last
+        d = np.sign(np.diff(np.concatenate(([prev], x))))
+
+        # Carry the last non-zero slope over plateaus
+        idx = np.where(d != 0, np.arange(len(d)), -1)
+        np.maximum.accumulate(idx, out=idx)
+        slope = np.where(idx >= 0, d[np.maximum(idx, 0)], self.slope)
+
+        before = np.concatenate(([self.slope], slope[:-1]))
+        turns = np.flatnonzero((d != 0) & (slope != before) & (before != 0))
+
+        self.last = x[-1]
+        self.slope = int(slope[-1])
+
+        # The peak is the sample before the slope turned
+        values = np.concatenate(([prev], x))[turns]
+        is_max = before[turns] > 0
+
+        keep = np.ones(len(turns), dtype=bool)
+        if self.mode == "max":
+            keep &= is_max
+        elif self.mode == "min":
+            keep &= ~is_max
+        if self.height is not None:
+            keep &= np.where(is_max, values >= self.height, values <= self.height)
+
+        turns, values, is_max = turns[keep], values[keep], is_max[keep]
+
+        events = []
+        for i, value, top in zip(turns, values, is_max):
+            index = self.count + int(i) - 1
+            if self.last_peak is not None and index - self.last_peak < self.distance:
+                continue
+            self.last_peak = index
+            events.append(self._event(int(i) - 1, value, extreme="max" if top else "min"))
+
+        return events
+
+
+class Tolerance(Detector):
+    """
+    Rolling-window tolerance: "exit" when the mean of the last window samples
+    leaves [low, high], "enter" when it returns
+    """
+
+    kind = "tolerance"
+
+    def __init__(self, low, high, window=1, timebase=None):
+        super().__init__(timebase)
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.low = low
+        self.high = high
+        self.window = window
+
+        self.tail = np.zeros(0)
+        self.inside = None
+
+    def _process(self, x):
+        data = np.concatenate((self.tail, x))
+        self.tail = data[-(self.window - 1):] if self.window > 1 else np.zeros(0)
+
+        if len(data) < self.window:
+            return []
+
+        c = np.concatenate(([0.0], np.cumsum(data)))
+        mean = (c[self.window:] - c[:-self.window]) / self.window
+
+        # mean[j] ends at data[j + window - 1], i.e. block sample j + window - 1 - len(tail_before)
+        shift = self.window - 1 - (len(data) - len(x))
+        inside = (mean >= self.low) & (mean <= self.high)
+
+        # Start out assumed inside, so a signal out of tolerance from the start is reported
+        prev = np.concatenate(([True if self.inside is None else self.inside], inside[:-1]))
+        changes = np.flatnonzero(inside != prev)
+        self.inside = bool(inside[-1])
+
+        return [self._event(j + shift, mean[j], edge="enter" if inside[j] else "exit")
+                for j in changes]
+
+
+def process(detectors, block):
+    """Feed block to every detector and return all events ordered by index"""
+    events = []
+    for detector in detectors:
+        events.extend(detector.process(block))
+    events.sort(key=lambda e: e.index)
+    return events
+
+
+class DetectorSink:
+    """
+    Pipeline sink running detectors on every block and calling on_event(event)
+    A timebase passed here is shared with detectors that have none
+    """
+
+    def __init__(self, detectors, on_event, timebase=None):
+        self.detectors = list(detectors)
+        self.on_event = on_event
+        for d in self.detectors:
+            if d.timebase is None:
+                d.timebase = timebase
+
+    def write(self, samples):
+        for event in process(self.detectors, samples):
+            self.on_event(event)
+
+    def close(self):
+        pass
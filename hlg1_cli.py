@@ -0,0 +1,423 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Command Line Tool
+One entry point for configuring, triggering, reading out and monitoring the
+HL-G1. Subcommands can be chained with "+" and then share one connection:
+
+    hlg1 -d /dev/ttyUSB0 configure + trigger
+    hlg1 -d /dev/ttyUSB0 readout output_data.txt + configure
+
+pyserial, NumPy and the pipeline modules are only imported by the
+subcommands that need them, so short invocations start quickly.
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+DEFAULT_DEVICE = "/dev/ttyUSB0"
+DEFAULT_BAUD = 230400
+
+CHAIN = "+"
+
+
+class Context:
+    """State shared by chained subcommands; opens the device on first use"""
+
+    def __init__(self, serial_device=DEFAULT_DEVICE, baud=DEFAULT_BAUD):
+        self.serial_device = serial_device
+        self.baud = baud
+        self.anchor = None
+        self._hlg = None
+
+    @property
+    def hlg(self):
+        if self._hlg is None:
+            from HLG1 import HLG1
+            self._hlg = HLG1(self.serial_device, self.baud)
+        return self._hlg
+
+    def close(self):
+        if self._hlg is not None:
+            self._hlg.close()
+            self._hlg = None
+
+
+# --------------------------
+# Subcommands
+# --------------------------
+
+def cmd_configure(ctx, args):
+    """Set the zero offset and arm triggered buffering"""
+    hlg = ctx.hlg
+
+    # Zero offset configuration
+    hlg.set_offset(0)
+    current_measure = hlg.get_measurement()
+    hlg.set_offset(-current_measure)
+    print(f"Zero offset set to: {hlg.get_offset()/10000:.4f}mm")
+
+    rate, amount, trigger_point, delay = args.rate, args.amount, args.trigger_point, args.delay
+    if args.window:
+        from planner import plan_for
+        plan = plan_for(hlg, args.window[0], args.window[1], args.resolution, ctx.baud)
+        rate, amount, trigger_point, delay = plan.rate, plan.amount, plan.trigger_point, plan.delay
+        print(f"Planned {plan}: capture {plan.capture_time:.4f} s, "
+              f"readout {plan.readout_bytes} bytes in {plan.readout_time:.4f} s")
+
+    # Buffer configuration
+    hlg.set_buffering_operation(False)
+    hlg.set_buffering_rate(rate)
+    hlg.set_buffering_mode(True)
+    hlg.set_zero_set(1)
+    hlg.set_zero_set(0)
+
+    # Trigger configuration
+    hlg.set_accumulated_amount(amount)
+    hlg.set_trigger_point(trigger_point)
+    hlg.set_trigger_delay(delay)
+    hlg.set_trigger_conditions(args.conditions)
+
+    # Start buffering
+    hlg.set_buffering_operation(True)
+    print(f"Buffer status: {hlg.get_buffering_status()}")
+
+    hlg.set_timing_input(0)
+
+
+def cmd_trigger(ctx, args):
+    """Activate the timing input and print the host-clock anchor"""
+    hlg = ctx.hlg
+
+    print(f"Current timing input state: {hlg.get_timing_input()}")
+
+    before = time.time()
+    hlg.set_timing_input(1)
+    ctx.anchor = (before + time.time()) / 2
+    print(f"Trigger anchor: {ctx.anchor:.6f}")
+
+    print(f"New timing input state: {hlg.get_timing_input()}")
+
+
+def cmd_readout(ctx, args):
+    """Save the buffer to a file, one measurement per line, plus its timebase"""
+    import roi
+    from HLG1 import parse_data
+    from pipeline import Pipeline, FileSink, ArchiveSink, once
+
+    hlg = ctx.hlg
+
+    buf_stats = hlg.get_buffering_status()
+    if buf_stats != "3":
+        print(f"ERROR: Buffer not ready (status: {buf_stats})")
+        print(f"Current trigger conditions: {hlg.get_trigger_conditions()}")
+        return 1
+
+    hlg.set_timing_input(0)
+
+    # Only the requested window goes over the wire
+    last = hlg.get_last_datapoint()
+    start, end = 1, last
+    if args.range:
+        start, end = args.range
+    elif args.around:
+        start, end = roi.trigger_window(hlg, *args.around)
+    elif args.post:
+        start, end = roi.post_trigger_window(hlg, last)
+    elif args.time:
+        start, end = roi.time_window(hlg, args.time[0], args.time[1], last)
+    try:
+        start, end = roi.clamp(start, end, last)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+    if (start, end) != (1, last):
+        logging.info(f"Reading samples {start}..{end} of {last}")
+
+    if args.output_file.endswith(".hlgc"):
+        from capture_codec import Encoder
+        sinks = [Encoder(args.output_file)]
+    else:
+        sinks = [FileSink(args.output_file)]
+    if args.archive:
+        sinks.append(ArchiveSink(args.archive))
+
+    stats = Pipeline(once(lambda: hlg.read_data_raw(start, end)), parse_data, sinks).run()
+    logging.info(f"Saved {stats['decoder']['samples']} measurements")
+    logging.debug(f"Pipeline stats: {stats}")
+
+    from timebase import read_timebase, write_sidecar
+    anchor = args.anchor if args.anchor is not None else ctx.anchor
+    timebase = read_timebase(hlg, last, anchor).slice(start - 1, end)
+    write_sidecar(args.output_file, timebase)
+
+
+def cmd_monitor(ctx, args):
+    """Print buffering status, last data point and measurement periodically"""
+    hlg = ctx.hlg
+
+    n = 0
+    while args.count is None or n < args.count:
+        status = hlg.get_buffering_status()
+        last = hlg.get_last_datapoint()
+        value = hlg.get_measurement()
+        print(f"{time.time():.3f} status={status} last={last} measurement={value}", flush=True)
+        n += 1
+        time.sleep(args.interval)
+
+
+def _feed_server(bind, port, live=None, capture_files=()):
+    import os
+    from live_feed import FeedServer, load_capture
+
+    captures = {os.path.basename(p): load_capture(p) for p in capture_files}
+    logging.info(f"Serving on http://{bind}:{port}/")
+    return FeedServer((bind, port), live, captures)
+
+
+def cmd_stream(ctx, args):
+    """Poll measurements continuously to stdout, a shared-memory ring or HTTP"""
+    import threading
+    from HLG1 import parse_data
+    from pipeline import Pipeline, LineSink, poll
+
+    hlg = ctx.hlg
+    sinks = []
+    server = None
+    if args.http is not None:
+        from live_feed import LiveBuffer
+        live = LiveBuffer()
+        sinks.append(live)
+        server = _feed_server(args.bind, args.http, live)
+        threading.Thread(target=server.serve_forever, name="feed", daemon=True).start()
+    if args.shm:
+        from shm_ring import RingWriter
+        sinks.append(RingWriter(args.shm, args.capacity))
+    if not sinks:
+        sinks.append(LineSink(sys.stdout))
+
+    def decode(output):
+        return None if hlg.check_error(output) else parse_data(output)
+
+    # Polling, decoding and publishing run on their own threads
+    stop = threading.Event()
+    source = poll(lambda: hlg.transact("RMD"), args.count, args.interval, stop)
+    pipeline = Pipeline(source, decode, sinks).start()
+    try:
+        pipeline.join()
+    except KeyboardInterrupt:
+        stop.set()
+        pipeline.join()
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+def cmd_serve(ctx, args):
+    """Serve capture files and, with --live, live measurements over HTTP, see live_feed.py"""
+    from live_feed import LiveBuffer, MeasurementPoller
+
+    live = None
+    if args.live:
+        live = LiveBuffer()
+        MeasurementPoller(ctx.hlg, live, args.interval).start()
+    _feed_server(args.bind, args.port, live, args.captures).serve_forever()
+
+
+def cmd_follow(ctx, args):
+    """Print the samples published to a shared-memory ring by "stream --shm", see shm_ring.py"""
+    from shm_ring import follow
+    follow(args.name)
+
+
+def cmd_bench(ctx, args):
+    """Run the benchmark suite against the simulator, see bench.py"""
+    import bench
+    return bench.main(args.extra)
+
+
+def cmd_convert(ctx, args):
+    """Convert readout text files to .hlgc captures, see convert.py"""
+    import convert
+    return convert.main(args.extra)
+
+
+# --------------------------
+# Argument parsing
+# --------------------------
+
+def _connection_args(parser, defaults):
+    parser.add_argument("-d", "--serial_device",
+                        default=DEFAULT_DEVICE if defaults else argparse.SUPPRESS,
+                        help=f"Serial port, tcp://host:port or rfc2217://host:port (default: {DEFAULT_DEVICE})")
+    parser.add_argument("-b", "--baud",
+                        default=DEFAULT_BAUD if defaults else argparse.SUPPRESS,
+                        type=int,
+                        help=f"Baud rate (default: {DEFAULT_BAUD})")
+
+
+def _bind_arg(parser):
+    parser.add_argument("--bind", default="127.0.0.1",
+                        help="Address the HTTP feed listens on, 0.0.0.0 for all interfaces "
+                             "(default: 127.0.0.1)")
+
+
+def build_parser():
+    argp = argparse.ArgumentParser(
+        prog="hlg1",
+        description="Control the Panasonic HL-G1. Chain subcommands with '" + CHAIN + "'.")
+    _connection_args(argp, True)
+    argp.add_argument("-v", "--verbose", action="store_true", help="Debug logging")
+    argp.add_argument("-q", "--quiet", action="store_true", help="Only log warnings")
+
+    sub = argp.add_subparsers(dest="command", metavar="command", required=True)
+
+    p = sub.add_parser("configure", help="Set zero offset and arm triggered buffering")
+    _connection_args(p, False)
+    p.add_argument("--rate", default=1, type=int, help="Buffering rate (default: 1)")
+    p.add_argument("--amount", default=3000, type=int, help="Accumulated amount (default: 3000)")
+    p.add_argument("--trigger-point", default=300, type=int, help="Trigger point (default: 300)")
+    p.add_argument("--delay", default=0, type=int, help="Trigger delay (default: 0)")
+    p.add_argument("--conditions", default=0, type=int,
+                   help="Trigger conditions (default: 0, timing input)")
+    p.add_argument("--window", nargs=2, type=float, metavar=("START", "END"),
+                   help="Plan rate, amount, trigger point and delay for this window, "
+                        "in seconds relative to the trigger")
+    p.add_argument("--resolution", default=0.0002, type=float,
+                   help="Largest time between samples for --window (default: 0.0002)")
+    p.set_defaults(func=cmd_configure)
+
+    p = sub.add_parser("trigger", help="Activate the timing input")
+    _connection_args(p, False)
+    p.set_defaults(func=cmd_trigger)
+
+    p = sub.add_parser("readout", help="Save buffered data to a file")
+    _connection_args(p, False)
+    p.add_argument("-a", "--archive", help="Also append measurements to this gzip archive")
+    p.add_argument("-t", "--anchor", type=float,
+                   help="Host time of the trigger (default: from a chained trigger)")
+    window = p.add_mutually_exclusive_group()
+    window.add_argument("--range", nargs=2, type=int, metavar=("START", "END"),
+                        help="Only read buffer indexes START..END (1-based)")
+    window.add_argument("--around", nargs=2, type=int, metavar=("BEFORE", "AFTER"),
+                        help="Only read BEFORE samples ahead of the trigger point to AFTER past it")
+    window.add_argument("--post", action="store_true",
+                        help="Only read from the trigger point on")
+    window.add_argument("--time", nargs=2, type=float, metavar=("T0", "T1"),
+                        help="Only read samples between T0 and T1 seconds relative to the trigger")
+    p.add_argument("output_file",
+                   help="Output file path for measurement data (.hlgc: compressed capture)")
+    p.set_defaults(func=cmd_readout)
+
+    p = sub.add_parser("monitor", help="Print device status periodically")
+    _connection_args(p, False)
+    p.add_argument("-i", "--interval", default=1.0, type=float,
+                   help="Seconds between readings (default: 1)")
+    p.add_argument("-n", "--count", type=int, help="Stop after this many readings")
+    p.set_defaults(func=cmd_monitor)
+
+    p = sub.add_parser("stream", help="Poll measurements continuously")
+    _connection_args(p, False)
+    p.add_argument("-i", "--interval", default=0.0, type=float,
+                   help="Seconds between samples (default: 0)")
+    p.add_argument("-n", "--count", type=int, help="Stop after this many samples")
+    p.add_argument("--shm", metavar="NAME", help="Publish to a shared-memory ring")
+    p.add_argument("--capacity", default=1 << 20, type=int,
+                   help="Shared-memory ring size in samples (default: 1048576)")
+    p.add_argument("--http", metavar="PORT", type=int, help="Serve a live HTTP feed")
+    _bind_arg(p)
+    p.set_defaults(func=cmd_stream)
+
+    p = sub.add_parser("serve", help="Serve captures and live data over HTTP")
+    _connection_args(p, False)
+    p.add_argument("-p", "--port", default=8080, type=int, help="HTTP port (default: 8080)")
+    _bind_arg(p)
+    p.add_argument("--live", action="store_true", help="Also poll and serve live measurements")
+    p.add_argument("-i", "--interval", default=0.01, type=float,
+                   help="Live polling interval in seconds (default: 0.01)")
+    p.add_argument("captures", nargs="*", help="Capture files to serve (text or .hlgc)")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("follow", help="Print the samples of a shared-memory ring")
+    p.add_argument("name", nargs="?", default="hlg1", help="Ring name (default: hlg1)")
+    p.set_defaults(func=cmd_follow)
+
+    # Remaining options are passed on to bench.py
+    p = sub.add_parser("bench", help="Run the benchmark suite (options as bench.py)",
+                       add_help=False)
+    p.set_defaults(func=cmd_bench)
+
+    # Remaining options are passed on to convert.py
+    p = sub.add_parser("convert", help="Convert readout text files (options as convert.py)",
+                       add_help=False)
+    p.set_defaults(func=cmd_convert)
+
+    return argp
+
+
+def split_chain(argv):
+    """Split argv on the chain separator, keeping global options with the first part"""
+    parts = [[]]
+    for arg in argv:
+        if arg == CHAIN:
+            parts.append([])
+        else:
+            parts[-1].append(arg)
+    return parts
+
+
+def _parse(argp, argv):
+    args, args.extra = argp.parse_known_args(argv)
+    if args.extra and args.command not in ("bench", "convert"):
+        argp.error("unrecognized arguments: " + " ".join(args.extra))
+    return args
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    argp = build_parser()
+    parts = split_chain(argv)
+
+    first = _parse(argp, parts[0])
+    commands = [first]
+
+    # Later parts inherit the connection of the first one
+    argp.set_defaults(serial_device=first.serial_device, baud=first.baud)
+    for part in parts[1:]:
+        args = _parse(argp, part)
+        if (args.serial_device, args.baud) != (first.serial_device, first.baud):
+            argp.error("chained subcommands share one connection")
+        commands.append(args)
+
+    if first.verbose:
+        level = logging.DEBUG
+    elif first.quiet:
+        level = logging.WARNING
+    else:
+        level = logging.INFO
+    logging.basicConfig(
+        format='%(asctime)s %(levelname)-8s %(message)s',
+        level=level,
+        datefmt='%Y-%m-%d %H:%M:%S')
+
+    ctx = Context(first.serial_device, first.baud)
+
+    start_time = time.time()
+    try:
+        for args in commands:
+            rc = args.func(ctx, args)
+            if rc:
+                return rc
+    finally:
+        ctx.close()
+
+    logging.info(f"Completed in {time.time() - start_time:.2f} seconds")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Serial Simulator
+In-process stand-in for the sensor's serial port, scripted after the command
+set in "HLG1 cmd.md". Used by the benchmarks and for testing without hardware:
+
+    hlg = HLG1(port=SimulatedSerial(baud=115200))
+
+Wire time is accounted as 10 bits per byte at the configured baud rate. By
+default it is only added to wire_time, so benchmarks stay fast and repeatable;
+with realtime=True every exchange also sleeps for it.
+
+It can also stand in for a serial device server on the network:
+
+    python hlg1_sim.py --tcp 4001
+    hlg1 -d tcp://localhost:4001 configure + trigger + readout out.txt
+"""
+
+import argparse
+import logging
+import math
+import random
+import socketserver
+import threading
+import time
+
+# Register commands: R<xx> reads, W<xx> writes; value and digits in the reply
+REGISTERS = {
+    "SP": (0, 5),      # sampling cycle
+    "FB": (0, 5),      # shutter time
+    "BD": (0, 5),      # buffering mode
+    "BS": (0, 5),      # buffering operation
+    "BR": (1, 5),      # buffer rate
+    "ZS": (0, 5),      # zero set
+    "BC": (3000, 5),   # accumulated amount
+    "TP": (300, 5),    # trigger point
+    "TL": (0, 5),      # trigger delay
+    "TR": (0, 5),      # trigger conditions
+    "BL": (0, 7),      # trigger threshold
+    "ML": (0, 7),      # offset
+    "AD": (0, 5),      # digital output at alarm
+    "HC": (0, 5),      # alarm delay time
+    "TM": (0, 5),      # timing mode
+    "TI": (0, 5),      # timing input
+}
+
+BUFFER_SIZE = 3000
+
+# Buffering status codes as returned by RTS
+NONE, WAITING, ACCUMULATING, COMPLETED = range(4)
+
+
+def waveform(n, seed=0):
+    """Smooth displacement trace in 0.1 um units with a step and some noise"""
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        v = 250000 * math.sin(i / 150.0) + rnd.gauss(0, 50)
+        if i >= n // 2:
+            v += 120000
+        out.append(int(v))
+    return out
+
+
+class SimulatedSerial:
+    """
+    Serial-like object answering HL-G1 commands
+    Args:
+        baud:       simulated link speed for wire time accounting
+        realtime:   sleep for the wire time of every exchange
+        id:         device id answered to
+        seed:       seed of the simulated displacement signal
+    """
+
+    name = "simulator"
+
+    def __init__(self, baud=230400, realtime=False, id="01", seed=0):
+        self.baud = baud
+        self.realtime = realtime
+        self.id = id
+        self.seed = seed
+
+        self.registers = {k: v for k, (v, _) in REGISTERS.items()}
+        self.status = NONE
+        self.buffer = []
+        self.position = 0
+
+        self._out = bytearray()
+        self.wire_time = 0.0
+        self.commands = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    # --------------------------
+    # Serial interface
+    # --------------------------
+
+    @property
+    def in_waiting(self):
+        return len(self._out)
+
+    def write(self, data):
+        self.bytes_in += len(data)
+        reply = self._handle(bytes(data).decode("ASCII"))
+        self._out += reply
+        self.bytes_out += len(reply)
+        self.commands += 1
+
+        t = (len(data) + len(reply)) * 10 / self.baud
+        self.wire_time += t
+        if self.realtime:
+            time.sleep(t)
+
+        return len(data)
+
+    def read(self, size=1):
+        data = bytes(self._out[:size])
+        del self._out[:size]
+        return data
+
+    def read_until(self, expected=b"\r", size=None):
+        i = self._out.find(expected)
+        end = len(self._out) if i < 0 else i + len(expected)
+        if size is not None:
+            end = min(end, size)
+        return self.read(end)
+
+    def reset_input_buffer(self):
+        self._out.clear()
+
+    def close(self):
+        pass
+
+    # --------------------------
+    # Benchmark helpers
+    # --------------------------
+
+    def feed(self, data):
+        """Queue data to be read as if the device had sent it"""
+        self._out += data
+
+    def rla_reply(self, n=BUFFER_SIZE):
+        """RLA reply to reading all of a freshly completed n sample capture"""
+        self.registers["BC"] = n
+        self._fill()
+        return self._read_buffer("RLA", "00001" + "%05d" % len(self.buffer))
+
+    # --------------------------
+    # Device behaviour
+    # --------------------------
+
+    def measurement(self):
+        self.position += 1
+        v = 250000 * math.sin(self.position / 150.0)
+        return int(v) + self.registers["ML"]
+
+    def _reply(self, body):
+        return ("%" + self.id + "$" + body + "**\r").encode("ASCII")
+
+    def _error(self, code):
+        return ("%" + self.id + "!" + code + "**\r").encode("ASCII")
+
+    def _handle(self, msg):
+        if not msg.startswith("%" + self.id + "#") or not msg.endswith("**\r"):
+            return self._error("01")
+
+        cmd = msg[4:7]
+        arg = msg[7:-3]
+
+        if cmd == "RMD":
+            return self._reply(cmd + "%+08d" % self.measurement())
+        if cmd == "RTS":
+            return self._reply(cmd + "+%05d" % self.status)
+        if cmd == "RLD":
+            return self._reply(cmd + "+%05d" % len(self.buffer))
+        if cmd in ("ROA", "RMB"):
+            return self._reply(cmd + "+00000")
+        if cmd == "RLA":
+            return self._read_buffer(cmd, arg)
+
+        reg = cmd[1:]
+        if reg not in REGISTERS:
+            return self._error("01")
+        digits = REGISTERS[reg][1]
+
+        if cmd[0] == "R":
+            return self._reply(cmd + "%+0*d" % (digits + 1, self.registers[reg]))
+
+        if cmd[0] == "W":
+            try:
+                value = int(arg)
+            except ValueError:
+                return self._error("03")
+            self.registers[reg] = value
+            self._update(reg, value)
+            return self._reply(cmd)
+
+        return self._error("01")
+
+    def _update(self, reg, value):
+        if reg == "BS":
+            if value:
+                self.buffer = []
+                self.status = WAITING if self.registers["BD"] else ACCUMULATING
+                if not self.registers["BD"]:
+                    self._fill()
+            else:
+                self.status = NONE
+        elif reg == "TI" and value and self.status == WAITING:
+            self._fill()
+
+    def _fill(self):
+        n = min(self.registers["BC"], BUFFER_SIZE)
+        self.buffer = [v + self.registers["ML"] for v in waveform(n, self.seed)]
+        self.status = COMPLETED
+
+    def _read_buffer(self, cmd, arg):
+        if len(arg) != 10 or not arg.isdigit():
+            return self._error("03")
+
+        start, end = int(arg[:5]), int(arg[5:])
+        if not 1 <= start <= end <= len(self.buffer):
+            return self._error("31")
+
+        data = "".join("%+08d" % v for v in self.buffer[start - 1:end])
+        return self._reply(cmd + data)
+
+
+# --------------------------
+# TCP device server
+# --------------------------
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        sim = self.server.sim
+        pending = b""
+        while True:
+            data = self.request.recv(4096)
+            if not data:
+                break
+            pending += data
+
+            *commands, pending = pending.split(b"\r")
+            for cmd in commands:
+                with self.server.lock:
+                    sim.write(cmd + b"\r")
+                    reply = sim.read(sim.in_waiting)
+                self.request.sendall(reply)
+
+
+class SimulatorServer(socketserver.ThreadingTCPServer):
+    """Raw TCP server in front of one SimulatedSerial, like a serial device server"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, sim=None):
+        super().__init__(address, _Handler)
+        self.sim = sim if sim is not None else SimulatedSerial()
+        self.lock = threading.Lock()
+
+
+def main():
+    logging.basicConfig(
+        format='%(asctime)s %(levelname)-8s %(message)s',
+        level=logging.INFO,
+        datefmt='%Y-%m-%d %H:%M:%S')
+
+    argp = argparse.ArgumentParser(description="Simulated HL-G1 behind a TCP device server")
+    argp.add_argument("--tcp",
+                     default=4001,
+                     type=int,
+                     help="TCP port to listen on (default: 4001)")
+    argp.add_argument("-b", "--baud",
+                     default=230400,
+                     type=int,
+                     help="Simulated serial baud rate (default: 230400)")
+    argp.add_argument("--realtime",
+                     action="store_true",
+                     help="Delay replies by the simulated serial transfer time")
+    args = argp.parse_args()
+
+    server = SimulatorServer(("", args.tcp), SimulatedSerial(args.baud, args.realtime))
+    logging.info(f"Simulated HL-G1 on tcp://localhost:{args.tcp}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
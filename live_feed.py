@@ -0,0 +1,331 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Live Visualization Feed
+Serves captures and a live displacement stream over HTTP, downsampled on the
+server to the client's pixel width
+
+Endpoints:
+    GET /                           minimal browser viewer
+    GET /captures                   list of loaded captures
+    GET /captures/<name>?width=W    capture, downsampled to W pixels
+                       &start=I&end=J   zoom window (full resolution if it fits)
+                       &mode=lttb|minmax
+    GET /live?width=W&last=N        last N live samples, downsampled
+    GET /live/stream?width=W&last=N Server-Sent Events, one frame per update
+
+Started with "hlg1 serve [--live] [captures...]".
+"""
+
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+DEFAULT_WIDTH = 800
+
+# The feed has no authentication; only serve other hosts when asked to
+DEFAULT_BIND = "127.0.0.1"
+
+
+# --------------------------
+# Downsampling
+# --------------------------
+
+def minmax(y, width, offset=0):
+    """
+    Keep the minimum and maximum of each of width/2 equal bins
+    Returns (x, y) with x the original sample indexes (plus offset)
+    """
+    y = np.asarray(y)
+    n = len(y)
+    x = np.arange(offset, offset + n)
+
+    if n <= width:
+        return x, y
+    if width < 2:
+        return x[:width], y[:width]
+    nbins = width // 2
+
+    k = -(-n // nbins)
+    m = n // k
+    body = y[:m * k].reshape(m, k)
+
+    base = np.arange(m) * k
+    lo = base + body.argmin(axis=1)
+    hi = base + body.argmax(axis=1)
+
+    if m * k < n:
+        tail = y[m * k:]
+        lo = np.append(lo, m * k + tail.argmin())
+        hi = np.append(hi, m * k + tail.argmax())
+
+    idx = np.unique(np.concatenate((lo, hi)))
+    return x[idx], y[idx]
+
+
+def lttb(y, width, offset=0):
+    """
+    Largest-Triangle-Three-Buckets downsampling to width points
+    Returns (x, y) with x the original sample indexes (plus offset)
+    """
+    y = np.asarray(y)
+    n = len(y)
+    x = np.arange(offset, offset + n)
+
+    if n <= width:
+        return x, y
+    if width < 3:
+        # No bucket between the end points
+        idx = [0, n - 1][:width]
+        return x[idx], y[idx]
+
+    yf = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, width - 1).astype(np.int64)
+
+    idx = np.empty(width, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+
+    a = 0
+    for i in range(width - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        if nhi <= nlo:
+            nhi = nlo + 1
+
+        cx = (nlo + nhi - 1) / 2.0
+        cy = yf[nlo:nhi].mean()
+
+        bx = np.arange(lo, hi)
+        area = np.abs((a - cx) * (yf[lo:hi] - yf[a]) - (a - bx) * (cy - yf[a]))
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+
+    return x[idx], y[idx]
+
+
+DOWNSAMPLERS = {
+    "lttb": lttb,
+    "minmax": minmax,
+}
+
+
+def downsample(y, width, start=0, end=None, mode="lttb"):
+    """
+    Downsample y[start:end] to width points
+    The window is returned at full resolution when it already fits
+    """
+    if mode not in DOWNSAMPLERS:
+        raise ValueError("Unknown downsampling mode " + str(mode))
+    if width < 1:
+        raise ValueError("width must be at least 1")
+
+    n = len(y)
+    end = n if end is None else min(end, n)
+    start = max(0, min(start, end))
+
+    window = np.asarray(y[start:end])
+    x, v = DOWNSAMPLERS[mode](window, width, offset=start)
+
+    return {
+        "start": start,
+        "end": end,
+        "total": n,
+        "full": len(v) == len(window),
+        "x": x.tolist(),
+        "y": v.tolist(),
+    }
+
+
+# --------------------------
+# Data sources
+# --------------------------
+
+class LiveBuffer:
+    """
+    Fixed-size history of the most recent samples
+    Works as a pipeline sink (write/close) and is fed by MeasurementPoller
+    """
+
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.int32)
+        self.count = 0
+        self.lock = threading.Lock()
+        self.updated = threading.Condition(self.lock)
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.int32)
+        n = len(samples)
+        # Of a block larger than the buffer only the end is kept, but all of it counts
+        samples = samples[-self.capacity:]
+        with self.lock:
+            pos = (self.count + n - len(samples)) % self.capacity
+            first = min(len(samples), self.capacity - pos)
+            self.data[pos:pos + first] = samples[:first]
+            self.data[:len(samples) - first] = samples[first:]
+            self.count += n
+            self.updated.notify_all()
+
+    def close(self):
+        pass
+
+    def last(self, n):
+        """Copy of the last n samples in order, and the total sample count"""
+        with self.lock:
+            n = min(n, self.count, self.capacity)
+            end = self.count % self.capacity
+            if n <= end:
+                out = self.data[end - n:end].copy()
+            else:
+                out = np.concatenate((self.data[end - n:], self.data[:end]))
+            return out, self.count
+
+    def wait(self, seen, timeout):
+        """Block until more than seen samples have been written"""
+        with self.lock:
+            self.updated.wait_for(lambda: self.count > seen, timeout)
+            return self.count
+
+
+class MeasurementPoller(threading.Thread):
+    """Polls get_measurement() into a LiveBuffer"""
+
+    def __init__(self, hlg, buffer, interval=0.01):
+        super().__init__(name="poller", daemon=True)
+        self.hlg = hlg
+        self.buffer = buffer
+        self.interval = interval
+        self.running = True
+
+    def run(self):
+        while self.running:
+            value = self.hlg.get_measurement()
+            if value is not None:
+                self.buffer.write([value])
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+
+
+def load_capture(path):
+    """Read a readout file: text, one measurement per line, or .hlgc"""
+    if path.endswith(".hlgc"):
+        import capture_codec
+        return capture_codec.load(path)
+    return np.loadtxt(path, dtype=np.int32, ndmin=1)
+
+
+# --------------------------
+# HTTP server
+# --------------------------
+
+VIEWER = b"""<!DOCTYPE html>
+<html><head><title>HL-G1 live</title></head>
+<body style="margin:0">
+<canvas id="c" style="width:100vw;height:100vh"></canvas>
+<script>
+const c = document.getElementById("c");
+const g = c.getContext("2d");
+function draw(f) {
+  c.width = c.clientWidth; c.height = c.clientHeight;
+  if (!f.y.length) return;
+  const lo = Math.min(...f.y), hi = Math.max(...f.y), span = (hi - lo) || 1;
+  const x0 = f.x[0], xs = (f.x[f.x.length - 1] - x0) || 1;
+  g.beginPath();
+  f.x.forEach((x, i) => {
+    const px = (x - x0) / xs * c.width, py = c.height - (f.y[i] - lo) / span * c.height;
+    i ? g.lineTo(px, py) : g.moveTo(px, py);
+  });
+  g.stroke();
+}
+const es = new EventSource("/live/stream?width=" + c.clientWidth);
+es.onmessage = e => draw(JSON.parse(e.data));
+</script></body></html>
+"""
+
+
+class FeedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, live=None, captures=None, stream_interval=0.1):
+        super().__init__(address, FeedHandler)
+        self.live = live
+        self.captures = captures if captures is not None else {}
+        self.stream_interval = stream_interval
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        logging.debug("Feed: " + format % args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split("/") if p]
+
+        try:
+            width = int(query.get("width", DEFAULT_WIDTH))
+            if width < 1:
+                raise ValueError("width must be at least 1")
+            mode = query.get("mode", "lttb")
+
+            if not parts:
+                self._send(200, VIEWER, "text/html")
+            elif parts == ["captures"]:
+                self._json({name: len(y) for name, y in self.server.captures.items()})
+            elif parts[0] == "captures" and len(parts) == 2:
+                y = self.server.captures.get(parts[1])
+                if y is None:
+                    self._json({"error": "unknown capture"}, 404)
+                    return
+                start = int(query.get("start", 0))
+                end = int(query["end"]) if "end" in query else None
+                self._json(downsample(y, width, start, end, mode))
+            elif parts == ["live"] and self.server.live is not None:
+                self._json(self._live_frame(width, int(query.get("last", 10000)), mode))
+            elif parts == ["live", "stream"] and self.server.live is not None:
+                self._stream(width, int(query.get("last", 10000)), mode)
+            else:
+                self._json({"error": "not found"}, 404)
+        except ValueError as e:
+            self._json({"error": str(e)}, 400)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _live_frame(self, width, last, mode):
+        y, count = self.server.live.last(last)
+        frame = downsample(y, width, mode=mode)
+        frame["count"] = count
+        frame["x"] = [i + count - len(y) for i in frame["x"]]
+        return frame
+
+    def _stream(self, width, last, mode):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        seen = -1
+        while True:
+            seen = self.server.live.wait(seen, timeout=1.0)
+            frame = json.dumps(self._live_frame(width, last, mode))
+            self.wfile.write(b"data: " + frame.encode() + b"\n\n")
+            self.wfile.flush()
+            time.sleep(self.server.stream_interval)
+
+    def _json(self, obj, status=200):
+        self._send(status, json.dumps(obj).encode(), "application/json")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,533 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Acquisition Pipeline
+Runs reader -> decoder -> sinks as separate threads joined by bounded queues,
+so a slow disk or network peer never stalls the serial link
+"""
+
+import collections
+import gzip
+import json
+import logging
+import os
+import pickle
+import socket
+import tempfile
+import threading
+import time
+
+BLOCK = "block"
+DROP_OLDEST = "drop-oldest"
+SPILL = "spill"
+
+POLICIES = (BLOCK, DROP_OLDEST, SPILL)
+
+
+class StageFailed(Exception):
+    """Raised by put() once the consumer of the queue has failed"""
+
+    def __init__(self, error):
+        super().__init__("downstream stage failed: " + repr(error))
+        self.error = error
+
+
+class BoundedQueue:
+    """
+    FIFO queue with a fixed in-memory depth and an explicit overflow policy
+    Policies:
+        block:       put() waits until a slot is free
+        drop-oldest: put() discards the oldest queued item
+        spill:       put() never waits and never touches storage: overflow is
+                     parked in memory and a spill thread moves it to a
+                     temporary file and back in order as get() makes room
+    """
+
+    def __init__(self, maxsize=64, policy=BLOCK, spill_dir=None):
+        if policy not in POLICIES:
+            raise ValueError("Unknown backpressure policy " + str(policy))
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.spill_dir = spill_dir
+
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._failed = None
+
+        # Spill policy, in FIFO order: _items, the spill file, _overflow.
+        # Only the spill thread does file I/O, without holding _cond.
+        self._overflow = collections.deque()
+        self._spill_count = 0
+        self._in_transit = 0
+        self._spill_thread = None
+        self._spill_file = None
+        self._spill_read = 0
+
+        self.puts = 0
+        self.gets = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.max_depth = 0
+
+    def put(self, item):
+        with self._cond:
+            self._check_failed()
+            if self._closed:
+                raise RuntimeError("put() on closed queue")
+
+            if self.policy == SPILL:
+                if self._overflow or self._spill_count or self._in_transit or \
+                        len(self._items) >= self.maxsize:
+                    self._overflow.append(item)
+                    self._start_spill()
+                else:
+                    self._items.append(item)
+            else:
+                if self.policy == BLOCK:
+                    while len(self._items) >= self.maxsize and self._failed is None:
+                        self._cond.wait()
+                    self._check_failed()
+                else:
+                    while len(self._items) >= self.maxsize:
+                        self._items.popleft()
+                        self.dropped += 1
+                self._items.append(item)
+
+            self.puts += 1
+            self.max_depth = max(self.max_depth, self.depth())
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Return the next item, or raise EOFError once closed and drained"""
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+
+            while not self._items:
+                if self._closed and not self.depth():
+                    raise EOFError
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError
+                self._cond.wait(remaining)
+
+            item = self._items.popleft()
+            self.gets += 1
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def fail(self, error):
+        """
+        Called by the consumer when it stops on error: queued items are
+        dropped and every put(), also one already waiting, raises StageFailed
+        """
+        with self._cond:
+            self._failed = error
+            self._items.clear()
+            self._overflow.clear()
+            self._spill_count = 0
+            self._cond.notify_all()
+
+    def _check_failed(self):
+        if self._failed is not None:
+            raise StageFailed(self._failed)
+
+    def depth(self):
+        return len(self._items) + len(self._overflow) + self._spill_count + self._in_transit
+
+    def stats(self):
+        with self._cond:
+            return {
+                "policy": self.policy,
+                "depth": self.depth(),
+                "max_depth": self.max_depth,
+                "puts": self.puts,
+                "gets": self.gets,
+                "dropped": self.dropped,
+                "spilled": self.spilled,
+            }
+
+    # --------------------------
+    # Spill thread
+    # --------------------------
+
+    def _start_spill(self):
+        if self._spill_thread is None:
+            self._spill_thread = threading.Thread(target=self._spill_run, name="spill", daemon=True)
+            self._spill_thread.start()
+
+    def _next_spill_job(self):
+        """Wait for work under _cond; returns ("read", n), ("write", items) or None to exit"""
+        while True:
+            if self._failed is not None:
+                return None
+
+            room = self.maxsize - len(self._items)
+            if room > 0 and self._spill_count:
+                n = min(room, self._spill_count)
+                self._spill_count -= n
+                self._in_transit += n
+                return "read", n
+
+            if room > 0 and self._overflow:
+                # Nothing on disk: overflow goes straight back into memory
+                while room > 0 and self._overflow:
+                    self._items.append(self._overflow.popleft())
+                    room -= 1
+                self._cond.notify_all()
+                continue
+
+            if self._overflow:
+                batch = list(self._overflow)
+                self._overflow.clear()
+                self._in_transit += len(batch)
+                return "write", batch
+
+            if self._closed and not self._spill_count:
+                return None
+            self._cond.wait()
+
+    def _spill_run(self):
+        try:
+            while True:
+                with self._cond:
+                    job = self._next_spill_job()
+                    if job is None:
+                        self._spill_thread = None
+                        return
+
+                kind, arg = job
+                if kind == "write":
+                    self._spill_write(arg)
+                    with self._cond:
+                        self._in_transit -= len(arg)
+                        if self._failed is None:
+                            self._spill_count += len(arg)
+                            self.spilled += len(arg)
+                        self._cond.notify_all()
+                else:
+                    batch = self._spill_take(arg)
+                    with self._cond:
+                        self._in_transit -= arg
+                        if self._failed is None:
+                            self._items.extend(batch)
+                        self._cond.notify_all()
+        finally:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    def _spill_write(self, items):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="hlg1-spill-", dir=self.spill_dir)
+            self._spill_read = 0
+
+        self._spill_file.seek(0, os.SEEK_END)
+        for item in items:
+            pickle.dump(item, self._spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _spill_take(self, n):
+        self._spill_file.seek(self._spill_read)
+        items = [pickle.load(self._spill_file) for _ in range(n)]
+        self._spill_read = self._spill_file.tell()
+
+        # Start a fresh file once everything written has been read back
+        if self._spill_read == self._spill_file.seek(0, os.SEEK_END):
+            self._spill_file.close()
+            self._spill_file = None
+
+        return items
+
+
+class Stage(threading.Thread):
+    """Worker thread applying func to each item of inq and fanning results out"""
+
+    def __init__(self, name, func, inq, outqs=()):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inq = inq
+        self.outqs = list(outqs)
+
+        self.items_in = 0
+        self.items_out = 0
+        self.samples = 0
+        self.busy = 0.0
+        self.error = None
+        self._started_at = None
+        self._stopped_at = None
+
+    def run(self):
+        self._started_at = time.monotonic()
+        try:
+            while True:
+                try:
+                    item = self.inq.get()
+                except EOFError:
+                    break
+
+                self.items_in += 1
+                t = time.perf_counter()
+                result = self.func(item)
+                self.busy += time.perf_counter() - t
+
+                if result is None:
+                    continue
+
+                self.items_out += 1
+                self.samples += _count(result)
+                for q in self.outqs:
+                    q.put(result)
+        except StageFailed as e:
+            # A stage further down failed: stop and pass it on upstream
+            self.inq.fail(e.error)
+        except Exception as e:
+            self.error = e
+            logging.exception("Stage " + self.name + " failed")
+            self.inq.fail(e)
+        finally:
+            for q in self.outqs:
+                q.close()
+            self._stopped_at = time.monotonic()
+
+    def stats(self):
+        end = self._stopped_at or time.monotonic()
+        elapsed = end - self._started_at if self._started_at else 0.0
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "samples": self.samples,
+            "busy_s": round(self.busy, 6),
+            "elapsed_s": round(elapsed, 6),
+            "items_per_s": self.items_in / elapsed if elapsed else 0.0,
+            "samples_per_s": self.samples / elapsed if elapsed else 0.0,
+            "queue": self.inq.stats(),
+        }
+
+
+class Reader(threading.Thread):
+    """
+    Calls source() until it returns None and pushes each raw frame downstream
+    The output queue policy decides what happens when the decoder lags;
+    the reader itself never touches storage except through a spill queue.
+    It stops when a later stage fails.
+    """
+
+    def __init__(self, source, outq):
+        super().__init__(name="reader", daemon=True)
+        self.source = source
+        self.outq = outq
+
+        self.frames = 0
+        self.bytes = 0
+        self.busy = 0.0
+        self.error = None
+        self._started_at = None
+        self._stopped_at = None
+
+    def run(self):
+        self._started_at = time.monotonic()
+        try:
+            while True:
+                t = time.perf_counter()
+                frame = self.source()
+                self.busy += time.perf_counter() - t
+
+                if frame is None:
+                    break
+
+                self.frames += 1
+                self.bytes += len(frame)
+                self.outq.put(frame)
+        except StageFailed:
+            pass
+        except Exception as e:
+            self.error = e
+            logging.exception("Reader failed")
+        finally:
+            self.outq.close()
+            self._stopped_at = time.monotonic()
+
+    def stats(self):
+        end = self._stopped_at or time.monotonic()
+        elapsed = end - self._started_at if self._started_at else 0.0
+        return {
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "busy_s": round(self.busy, 6),
+            "elapsed_s": round(elapsed, 6),
+            "frames_per_s": self.frames / elapsed if elapsed else 0.0,
+            "bytes_per_s": self.bytes / elapsed if elapsed else 0.0,
+        }
+
+
+class Pipeline:
+    """
+    reader -> decoder -> sinks
+    Args:
+        source:         callable returning the next raw frame, or None at end
+        decoder:        callable turning a raw frame into a list of samples
+        sinks:          objects with write(samples) and close()
+        reader_queue:   (maxsize, policy) between reader and decoder
+        sink_queue:     (maxsize, policy) in front of every sink
+        spill_dir:      directory for spill files (default: system temp)
+    If a stage fails, the stages before it and the reader stop as well and
+    join() raises the error
+    """
+
+    def __init__(self, source, decoder, sinks,
+                 reader_queue=(64, SPILL),
+                 sink_queue=(64, BLOCK),
+                 spill_dir=None):
+        self.sinks = list(sinks)
+
+        self.raw_q = BoundedQueue(reader_queue[0], reader_queue[1], spill_dir)
+        self.sink_qs = [BoundedQueue(sink_queue[0], sink_queue[1], spill_dir)
+                        for _ in self.sinks]
+
+        self.reader = Reader(source, self.raw_q)
+        self.decoder = Stage("decoder", decoder, self.raw_q, self.sink_qs)
+        self.sink_stages = [
+            Stage("sink-" + type(s).__name__, _sink_writer(s), q)
+            for s, q in zip(self.sinks, self.sink_qs)
+        ]
+
+    def start(self):
+        for stage in self.sink_stages:
+            stage.start()
+        self.decoder.start()
+        self.reader.start()
+        return self
+
+    def join(self):
+        self.reader.join()
+        self.decoder.join()
+        for stage in self.sink_stages:
+            stage.join()
+        for sink in self.sinks:
+            sink.close()
+
+        for t in [self.reader, self.decoder] + self.sink_stages:
+            if t.error is not None:
+                raise t.error
+
+    def run(self):
+        self.start()
+        self.join()
+        return self.stats()
+
+    def stats(self):
+        return {
+            "reader": self.reader.stats(),
+            "decoder": self.decoder.stats(),
+            "sinks": {stage.name: stage.stats() for stage in self.sink_stages},
+        }
+
+
+def _sink_writer(sink):
+    def write(samples):
+        sink.write(samples)
+        return samples
+    return write
+
+
+def _count(result):
+    try:
+        return len(result)
+    except TypeError:
+        return 1
+
+
+def once(func):
+    """Wrap func as a source that yields a single frame"""
+    done = []
+
+    def source():
+        if done:
+            return None
+        done.append(True)
+        return func()
+
+    return source
+
+
+def poll(func, count=None, interval=0.0, stop=None):
+    """
+    Wrap func as a source called count times (default: until stop is set),
+    interval seconds apart
+    """
+    n = [0]
+
+    def source():
+        if (count is not None and n[0] >= count) or (stop is not None and stop.is_set()):
+            return None
+        if n[0] and interval:
+            time.sleep(interval)
+        n[0] += 1
+        return func()
+
+    return source
+
+
+# --------------------------
+# Sinks
+# --------------------------
+
+class FileSink:
+    """One measurement per line, as written by readout_buffer_over_serial.py"""
+
+    def __init__(self, path):
+        self.f = open(path, "w")
+
+    def write(self, samples):
+        self.f.write("".join(f"{s}\n" for s in samples))
+
+    def close(self):
+        self.f.close()
+
+
+class LineSink:
+    """One measurement per line to an open text stream, flushed after every block"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, samples):
+        self.f.write("".join(f"{s}\n" for s in samples))
+        self.f.flush()
+
+    def close(self):
+        pass
+
+
+class ArchiveSink:
+    """Appends every block to a gzip-compressed archive, one measurement per line"""
+
+    def __init__(self, path, compresslevel=6):
+        self.f = gzip.open(path, "at", compresslevel=compresslevel)
+
+    def write(self, samples):
+        self.f.write("".join(f"{s}\n" for s in samples))
+
+    def close(self):
+        self.f.close()
+
+
+class NetworkSink:
+    """Sends each block as one line of JSON over TCP"""
+
+    def __init__(self, host, port, timeout=5):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+
+    def write(self, samples):
+        msg = json.dumps({"t": time.time(), "samples": list(samples)})
+        self.sock.sendall(msg.encode() + b"\n")
+
+    def close(self):
+        self.sock.close()
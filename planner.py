@@ -0,0 +1,139 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Acquisition Planner
+Computes the buffering settings that capture a time window around the
+trigger at a required resolution with the fewest samples, and predicts how
+long the capture and the RLA readout take
+
+    plan = plan_capture(-0.05, 0.2, 0.002, baud=230400, sampling_cycle="0")
+    apply_plan(hlg, plan)
+
+Window times are seconds relative to the trigger. Trigger delay is counted in
+sampling cycles, as in timebase.py.
+"""
+
+import math
+
+from timebase import SAMPLING_CYCLES, make_timebase
+
+BUFFER_SIZE = 3000
+MAX_RATE = 65535
+MAX_DELAY = 65535
+
+# Bytes on the wire per RLA readout: RLD query/reply, RLA request, reply framing
+RLD_BYTES = len("%01#RLD**\r") + len("%01$RLD+03000**\r")
+RLA_REQUEST_BYTES = len("%01#RLA0000103000**\r")
+RLA_REPLY_BYTES = len("%01$RLA**\r")
+SAMPLE_BYTES = 8
+
+
+class Plan:
+    """Device settings for one capture plus predicted costs"""
+
+    def __init__(self, sampling_cycle, rate, amount, trigger_point, delay, baud):
+        self.sampling_cycle = sampling_cycle
+        self.rate = rate
+        self.amount = amount
+        self.trigger_point = trigger_point
+        self.delay = delay
+        self.baud = baud
+
+        cycle = SAMPLING_CYCLES[sampling_cycle]
+        self.step = cycle * rate
+
+        # Pre-trigger samples must be buffered before the trigger is accepted
+        self.pretrigger_time = (trigger_point - 1) * self.step
+        self.capture_time = delay * cycle + (amount - trigger_point) * self.step
+
+        self.readout_bytes = RLD_BYTES + RLA_REQUEST_BYTES + RLA_REPLY_BYTES + amount * SAMPLE_BYTES
+        self.readout_time = self.readout_bytes * 10 / baud
+
+    def __repr__(self):
+        return (f"Plan(rate={self.rate}, amount={self.amount}, "
+                f"trigger_point={self.trigger_point}, delay={self.delay})")
+
+    def timebase(self, anchor=None):
+        """Timebase of the capture this plan produces"""
+        return make_timebase(self.sampling_cycle, self.rate, self.trigger_point,
+                             self.delay, self.amount, anchor)
+
+    def to_dict(self):
+        return {
+            "sampling_cycle": self.sampling_cycle,
+            "rate": self.rate,
+            "amount": self.amount,
+            "trigger_point": self.trigger_point,
+            "delay": self.delay,
+            "step_s": self.step,
+            "pretrigger_time_s": self.pretrigger_time,
+            "capture_time_s": self.capture_time,
+            "readout_bytes": self.readout_bytes,
+            "readout_time_s": self.readout_time,
+        }
+
+
+def plan_capture(start, end, resolution, baud, sampling_cycle):
+    """
+    Plan a capture of [start, end] seconds around the trigger
+    Args:
+        start, end:     window relative to the trigger (start < end)
+        resolution:     largest acceptable time between samples
+        baud:           link baud rate, for the readout prediction
+        sampling_cycle: code returned by get_sampling_cycle()
+    Raises ValueError if the window does not fit the buffer at that resolution
+    """
+    if sampling_cycle not in SAMPLING_CYCLES:
+        raise ValueError("Unknown sampling cycle " + repr(sampling_cycle))
+    if end <= start:
+        raise ValueError("window end must be after start")
+
+    cycle = SAMPLING_CYCLES[sampling_cycle]
+    if resolution < cycle:
+        raise ValueError(f"resolution {resolution} s is finer than the sampling cycle {cycle} s")
+
+    # Coarsest rate that still meets the resolution
+    rate = min(MAX_RATE, max(1, int(math.floor(resolution / cycle + 1e-9))))
+    step = cycle * rate
+
+    if start >= 0:
+        # Window entirely after the trigger: skip to it with the trigger delay
+        delay = min(MAX_DELAY, int(math.floor(start / cycle + 1e-9)))
+        trigger_point = 1
+        amount = int(math.ceil((end - delay * cycle) / step - 1e-9)) + 1
+    else:
+        delay = 0
+        trigger_point = int(math.ceil(-start / step - 1e-9)) + 1
+        amount = trigger_point + max(0, int(math.ceil(end / step - 1e-9)))
+
+    if amount > BUFFER_SIZE:
+        raise ValueError(f"window needs {amount} samples at {step} s, "
+                         f"buffer holds {BUFFER_SIZE}; relax the resolution")
+
+    return Plan(sampling_cycle, rate, amount, trigger_point, delay, baud)
+
+
+def plan_for(hlg, start, end, resolution, baud):
+    """plan_capture() with the sampling cycle read from hlg"""
+    return plan_capture(start, end, resolution, baud, hlg.get_sampling_cycle())
+
+
+def apply_plan(hlg, plan, start=True):
+    """
+    Write the plan to the device in one uninterrupted sequence: stop
+    buffering, set rate, amount, trigger point and delay, then restart
+    buffering. With a ScheduledHLG1 the sequence runs as one scheduler job.
+    """
+    def write(hlg):
+        hlg.set_buffering_operation(False)
+        hlg.set_buffering_rate(plan.rate)
+        hlg.set_accumulated_amount(plan.amount)
+        hlg.set_trigger_point(plan.trigger_point)
+        hlg.set_trigger_delay(plan.delay)
+        if start:
+            hlg.set_buffering_operation(True)
+
+    if hasattr(hlg, "batch"):
+        hlg.batch(write)
+    else:
+        with hlg.lock:
+            write(hlg)
@@ -0,0 +1,116 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Region-of-Interest Readout
+Reads only a window of the buffer with RLA start/end, defined by absolute
+index, by offset from the trigger point or by time relative to the trigger.
+The rest of the buffer can be fetched later on demand.
+
+Indexes are 1-based and inclusive, as in the RLA command.
+"""
+
+import math
+
+from HLG1 import parse_data
+
+
+def trigger_window(hlg, before, after):
+    """Indexes from before samples ahead of the trigger point to after samples past it"""
+    tp = hlg.get_trigger_point()
+    return tp - before, tp + after
+
+
+def post_trigger_window(hlg, last=None):
+    """Trigger point up to the last data point"""
+    if last is None:
+        last = hlg.get_last_datapoint()
+    return hlg.get_trigger_point(), last
+
+
+def time_window(hlg, t0, t1, last=None):
+    """Indexes of the samples taken between t0 and t1 seconds relative to the trigger"""
+    from timebase import read_timebase
+
+    if last is None:
+        last = hlg.get_last_datapoint()
+    tb = read_timebase(hlg, last)
+
+    start = int(math.ceil(tb.index(t0) - 1e-9)) + 1
+    end = int(math.floor(tb.index(t1) + 1e-9)) + 1
+    return start, end
+
+
+def clamp(start, end, last):
+    """start..end limited to the buffer 1..last; ValueError if nothing is left"""
+    s, e = max(1, start), min(end, last)
+    if e < s:
+        raise ValueError(f"window {start}..{end} is outside the buffer 1..{last}")
+    return s, e
+
+
+class Window:
+    """
+    Samples start..end of the buffer, read with a single RLA request
+    Other parts of the same buffer are fetched and cached on demand
+    """
+
+    def __init__(self, hlg, start, end, last=None):
+        if last is None:
+            last = hlg.get_last_datapoint()
+
+        self.hlg = hlg
+        self.last = last
+        self.start, self.end = clamp(start, end, last)
+
+        self._parts = {}
+        self.samples = self.fetch(self.start, self.end)
+
+    def __len__(self):
+        return self.end - self.start + 1
+
+    def fetch(self, start, end):
+        """Samples start..end, read from the device once and cached"""
+        key = (start, end)
+        if key not in self._parts:
+            output = self.hlg.read_data_raw(start, end)
+            if output is None:
+                raise IOError(f"reading {start}..{end} failed")
+            self._parts[key] = parse_data(output)
+        return self._parts[key]
+
+    def before(self):
+        """Samples ahead of the window (one RLA request)"""
+        return self.fetch(1, self.start - 1) if self.start > 1 else []
+
+    def after(self):
+        """Samples past the window (one RLA request)"""
+        return self.fetch(self.end + 1, self.last) if self.end < self.last else []
+
+    def full(self):
+        """The whole buffer, fetching what was not read yet"""
+        return self.before() + self.samples + self.after()
+
+    def timebase(self, anchor=None):
+        """Timebase of the window samples"""
+        from timebase import read_timebase
+        return read_timebase(self.hlg, self.last, anchor).slice(self.start - 1, self.end)
+
+
+def read_window(hlg, start, end):
+    """Absolute indexes start..end"""
+    return Window(hlg, start, end)
+
+
+def read_around_trigger(hlg, before, after):
+    """before samples ahead of the trigger point up to after samples past it"""
+    return Window(hlg, *trigger_window(hlg, before, after))
+
+
+def read_post_trigger(hlg):
+    last = hlg.get_last_datapoint()
+    return Window(hlg, *post_trigger_window(hlg, last), last=last)
+
+
+def read_time_window(hlg, t0, t1):
+    """Samples taken between t0 and t1 seconds relative to the trigger"""
+    last = hlg.get_last_datapoint()
+    return Window(hlg, *time_window(hlg, t0, t1, last), last=last)
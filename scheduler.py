@@ -0,0 +1,165 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Command Scheduler
+Funnels all HLG1 calls through one I/O worker thread with priority classes,
+so a pending configuration query never delays a trigger
+
+Priority classes (lower runs first):
+    TRIGGER      timing input, buffering start/stop
+    MEASUREMENT  measurement values, buffer status and readout
+    CONFIG       all other settings and diagnostics
+
+A command already on the wire is always completed; priorities decide which
+queued command goes next.
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+TRIGGER = 0
+MEASUREMENT = 1
+CONFIG = 2
+
+PRIORITIES = {
+    "set_timing_input": TRIGGER,
+    "get_timing_input": TRIGGER,
+    "set_buffering_operation": TRIGGER,
+
+    "get_measurement": MEASUREMENT,
+    "get_buffering_status": MEASUREMENT,
+    "get_last_datapoint": MEASUREMENT,
+    "get_alarm_status": MEASUREMENT,
+    "get_all_outputs_read": MEASUREMENT,
+    "read_data": MEASUREMENT,
+    "read_data_raw": MEASUREMENT,
+}
+
+_STOP = object()
+
+
+class DeadlineExceeded(TimeoutError):
+    """The command was still queued when its deadline passed and was not sent"""
+
+
+class CommandScheduler:
+    """
+    Runs HLG1 methods on a single worker thread in priority order
+    Args:
+        hlg: connected HLG1 instance; no other thread should use it directly
+    """
+
+    def __init__(self, hlg):
+        self.hlg = hlg
+        self.queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self.worker = threading.Thread(target=self._run, name="hlg1-io", daemon=True)
+        self.worker.start()
+
+    def submit(self, method, *args, priority=None, timeout=None, **kwargs):
+        """
+        Queue hlg.<method>(*args, **kwargs) and return a Future
+        Args:
+            priority: TRIGGER, MEASUREMENT or CONFIG (default: by method name)
+            timeout:  seconds the command may wait in the queue before it is
+                      dropped with DeadlineExceeded
+        """
+        if priority is None:
+            priority = PRIORITIES.get(method, CONFIG)
+
+        func = getattr(self.hlg, method)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        future = Future()
+        self.queue.put((priority, next(self._seq), (future, method, func, args, kwargs, deadline)))
+        return future
+
+    def submit_batch(self, fn, priority=CONFIG, timeout=None):
+        """
+        Queue fn(hlg) as one job: the worker runs the whole sequence of calls
+        in fn without other commands in between. Returns a Future.
+        """
+        name = getattr(fn, "__name__", "batch")
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def func():
+            with self.hlg.lock:
+                return fn(self.hlg)
+
+        future = Future()
+        self.queue.put((priority, next(self._seq), (future, name, func, (), {}, deadline)))
+        return future
+
+    def urgent(self, method, *args, **kwargs):
+        """submit() ahead of everything that is not already TRIGGER class"""
+        return self.submit(method, *args, priority=TRIGGER, **kwargs)
+
+    def call(self, method, *args, priority=None, timeout=None, **kwargs):
+        """submit() and wait for the result"""
+        return self.submit(method, *args, priority=priority, timeout=timeout, **kwargs).result()
+
+    def close(self):
+        """Finish queued commands and stop the worker"""
+        self.queue.put((CONFIG + 1, next(self._seq), _STOP))
+        self.worker.join()
+
+    def _run(self):
+        while True:
+            _, _, item = self.queue.get()
+            if item is _STOP:
+                break
+
+            future, method, func, args, kwargs, deadline = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            if deadline is not None and time.monotonic() > deadline:
+                logging.warning("Dropping " + method + ", deadline exceeded")
+                future.set_exception(DeadlineExceeded(method + " deadline exceeded"))
+                continue
+
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+
+class ScheduledHLG1:
+    """
+    Thread-safe drop-in for HLG1: every method call goes through a
+    CommandScheduler and blocks until its result is available
+
+        hlg = ScheduledHLG1(HLG1("/dev/ttyUSB0"))
+        hlg.set_timing_input(1)                       # TRIGGER class
+        f = hlg.scheduler.submit("get_shutter_time")  # Future
+
+    The connection and its lock belong to the worker thread and are not
+    exposed; run call sequences that must not be interleaved with batch().
+    """
+
+    _HIDDEN = ("lock", "serial")
+
+    def __init__(self, hlg):
+        self.scheduler = CommandScheduler(hlg)
+
+    def __getattr__(self, name):
+        if name in self._HIDDEN:
+            raise AttributeError(name + " is owned by the scheduler worker, use batch()")
+        attr = getattr(self.scheduler.hlg, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self.scheduler.call(name, *args, **kwargs)
+
+        return call
+
+    def batch(self, fn, priority=CONFIG, timeout=None):
+        """Run fn(hlg) as one job on the worker and return its result"""
+        return self.scheduler.submit_batch(fn, priority, timeout).result()
+
+    def close(self):
+        self.scheduler.close()
@@ -0,0 +1,231 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Shared-Memory Sample Ring
+Single-writer / multi-reader ring buffer in multiprocessing.shared_memory so
+several processes can consume the same samples without copies
+
+Layout (all uint64 little endian, data is int32):
+    [0]  magic
+    [1]  capacity in samples
+    [2]  reserve   sequence number the writer is about to reach
+    [3]  head      sequence number of the last committed sample + 1
+    data starts at byte 64
+
+The writer bumps reserve, copies the samples, then bumps head. A sample with
+sequence number s is intact as long as s >= reserve - capacity, which readers
+check both before handing out views and again after using them.
+
+"hlg1 stream --shm NAME" publishes measurements, "hlg1 follow NAME" prints them.
+"""
+
+import logging
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+MAGIC = 0x484C473152494E47  # "HLG1RING"
+HEADER = 64
+DTYPE = np.int32
+
+_MAGIC, _CAPACITY, _RESERVE, _HEAD = range(4)
+
+# Rings created by this process; their tracker registration belongs to the writer
+_owned = set()
+
+
+class Overrun(Exception):
+    """Raised by RingReader.read(strict=True) when unread samples were overwritten"""
+
+    def __init__(self, lost):
+        super().__init__(f"reader fell behind, {lost} samples lost")
+        self.lost = lost
+
+
+class Block:
+    """
+    Samples returned by RingReader.read()
+    views are NumPy views straight into shared memory (one, or two on wrap)
+    seq is the sequence number of the first sample
+    lost is the number of samples skipped because the reader fell behind
+    """
+
+    def __init__(self, reader, seq, views, lost):
+        self.reader = reader
+        self.seq = seq
+        self.views = views
+        self.lost = lost
+
+    def __len__(self):
+        return sum(len(v) for v in self.views)
+
+    def valid(self):
+        """True if none of the samples were overwritten since read()"""
+        return self.reader.valid(self.seq)
+
+    def copy(self):
+        """Contiguous copy of the samples"""
+        if len(self.views) == 1:
+            return self.views[0].copy()
+        return np.concatenate(self.views)
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    # Before Python 3.13 attaching registers the segment with the resource
+    # tracker, which then unlinks it when this reader exits
+    if sys.version_info < (3, 13) and shm._name not in _owned:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class RingWriter:
+    """
+    Owner and only writer of a ring; also usable as a pipeline sink
+    Args:
+        name:      shared memory name (default: generated)
+        capacity:  ring size in samples
+    """
+
+    def __init__(self, name=None, capacity=1 << 20):
+        self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                              size=HEADER + capacity * np.dtype(DTYPE).itemsize)
+        self.name = self.shm.name
+        self.capacity = capacity
+        _owned.add(self.shm._name)
+
+        self.header = np.ndarray(4, dtype=np.uint64, buffer=self.shm.buf)
+        self.data = np.ndarray(capacity, dtype=DTYPE, buffer=self.shm.buf, offset=HEADER)
+
+        self.header[_CAPACITY] = capacity
+        self.header[_RESERVE] = 0
+        self.header[_HEAD] = 0
+        self.header[_MAGIC] = MAGIC
+
+        logging.info("Publishing samples on shared memory " + self.name)
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=DTYPE)
+        n = len(samples)
+        if not n:
+            return
+
+        head = int(self.header[_HEAD])
+        if n > self.capacity:
+            head += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+
+        self.header[_RESERVE] = head + n
+
+        pos = head % self.capacity
+        first = min(n, self.capacity - pos)
+        self.data[pos:pos + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+
+        self.header[_HEAD] = head + n
+
+    def close(self, unlink=True):
+        del self.header, self.data
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+            _owned.discard(self.shm._name)
+
+
+class RingReader:
+    """
+    Attaches to an existing ring
+    Args:
+        name:   shared memory name of the RingWriter
+        start:  "latest" to only see new samples, "oldest" to start at the
+                oldest sample still in the ring
+    """
+
+    def __init__(self, name, start="latest"):
+        self.shm = _attach(name)
+        self.header = np.ndarray(4, dtype=np.uint64, buffer=self.shm.buf)
+
+        if int(self.header[_MAGIC]) != MAGIC:
+            self.close()
+            raise ValueError(name + " is not an HL-G1 sample ring")
+
+        self.capacity = int(self.header[_CAPACITY])
+        self.data = np.ndarray(self.capacity, dtype=DTYPE, buffer=self.shm.buf, offset=HEADER)
+
+        head = int(self.header[_HEAD])
+        if start == "oldest":
+            self.seq = max(0, head - self.capacity)
+        else:
+            self.seq = head
+
+    def available(self):
+        return int(self.header[_HEAD]) - self.seq
+
+    def read(self, max_n=None, strict=False):
+        """
+        Return a Block of unread samples (possibly empty) without copying
+        If the writer lapped this reader, the lost samples are skipped and
+        counted in Block.lost, or Overrun is raised when strict is set
+        """
+        head = int(self.header[_HEAD])
+        oldest = int(self.header[_RESERVE]) - self.capacity
+
+        lost = 0
+        if self.seq < oldest:
+            lost = oldest - self.seq
+            if strict:
+                self.seq = oldest
+                raise Overrun(lost)
+            self.seq = oldest
+
+        n = head - self.seq
+        if max_n is not None:
+            n = min(n, max_n)
+
+        pos = self.seq % self.capacity
+        first = min(n, self.capacity - pos)
+        views = (self.data[pos:pos + first],)
+        if first < n:
+            views += (self.data[:n - first],)
+
+        block = Block(self, self.seq, views, lost)
+        self.seq += n
+        return block
+
+    def valid(self, seq):
+        return seq >= int(self.header[_RESERVE]) - self.capacity
+
+    def wait(self, timeout=None, poll=0.001):
+        """Sleep until unread samples are available; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.available():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+    def close(self):
+        del self.header
+        if hasattr(self, "data"):
+            del self.data
+        self.shm.close()
+
+
+def follow(name, out=sys.stdout):
+    """Attach to a ring and print every new sample, one per line"""
+    reader = RingReader(name)
+    try:
+        while True:
+            reader.wait()
+            block = reader.read()
+            if block.lost:
+                logging.warning(f"Fell behind, {block.lost} samples lost")
+            for v in block.views:
+                out.write("".join(f"{s}\n" for s in v))
+            out.flush()
+            if not block.valid():
+                logging.warning("Samples were overwritten while printing")
+    finally:
+        reader.close()
@@ -0,0 +1,17 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import threading
+
+import pytest
+
+from hlg1_sim import SimulatorServer
+
+
+@pytest.fixture
+def endpoint():
+    """tcp:// endpoint of a simulator served on a free local port"""
+    server = SimulatorServer(("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"tcp://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,55 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import io
+
+import numpy as np
+import pytest
+
+import capture_codec
+from capture_codec import DELTA, DELTA_OF_DELTA, Decoder, Encoder
+
+I32 = np.iinfo(np.int32)
+
+
+def _traces():
+    rng = np.random.default_rng(1)
+    return {
+        "empty": np.zeros(0, dtype=np.int32),
+        "single": np.array([I32.min], dtype=np.int32),
+        "smooth": (np.sin(np.arange(1000) / 50) * 1e6).astype(np.int32),
+        "noise": rng.integers(I32.min, I32.max, 1000, endpoint=True, dtype=np.int32),
+        # Largest possible steps, in both directions, every sample
+        "extremes": np.tile(np.array([I32.min, I32.max, I32.max, I32.min, 0], dtype=np.int32), 200),
+    }
+
+
+@pytest.mark.parametrize("compression", list(capture_codec.COMPRESSIONS))
+@pytest.mark.parametrize("order", [DELTA, DELTA_OF_DELTA])
+@pytest.mark.parametrize("name", list(_traces()))
+def test_round_trip(name, order, compression):
+    x = _traces()[name]
+    # A chunk size that does not divide the length puts a boundary mid-trace
+    y = capture_codec.decode(capture_codec.encode(x, order, compression, chunk_size=333))
+    assert y.dtype == np.int32
+    np.testing.assert_array_equal(y, x)
+
+
+def test_streaming_chunk_boundaries():
+    x = _traces()["noise"]
+    buf = io.BytesIO()
+    enc = Encoder(buf, chunk_size=64)
+    # Blocks smaller than, equal to and larger than a chunk
+    for lo, hi in [(0, 10), (10, 74), (74, 74), (74, 300), (300, 1000)]:
+        enc.write(x[lo:hi])
+    enc.flush()
+
+    buf.seek(0)
+    chunks = list(Decoder(buf))
+    assert [len(c) for c in chunks] == [64] * 15 + [40]
+    np.testing.assert_array_equal(np.concatenate(chunks), x)
+
+
+def test_truncated_stream():
+    data = capture_codec.encode(_traces()["smooth"])
+    with pytest.raises(ValueError):
+        capture_codec.decode(data[:-1])
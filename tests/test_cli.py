@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import json
+
+import pytest
+
+import hlg1_cli
+
+
+@pytest.fixture
+def filled(endpoint):
+    assert hlg1_cli.main(["-q", "-d", endpoint, "configure", "+", "trigger"]) == 0
+    return endpoint
+
+
+def test_readout_range(filled, tmp_path):
+    out = str(tmp_path / "out.txt")
+    assert hlg1_cli.main(["-q", "-d", filled, "readout", "--range", "10", "20", out]) == 0
+
+    with open(out) as f:
+        assert len(f.read().split()) == 11
+    with open(out + ".json") as f:
+        assert json.load(f)["n"] == 11
+
+
+def test_readout_range_outside_buffer(filled, tmp_path, capsys):
+    out = tmp_path / "out.txt"
+    assert hlg1_cli.main(["-q", "-d", filled, "readout", "--range", "3100", "3200", str(out)]) == 1
+
+    assert "outside the buffer" in capsys.readouterr().out
+    assert not out.exists()
+    assert not (tmp_path / "out.txt.json").exists()
+
+
+def test_stream_count(endpoint, capsys):
+    assert hlg1_cli.main(["-q", "-d", endpoint, "stream", "-n", "5"]) == 0
+
+    lines = capsys.readouterr().out.split()
+    assert len(lines) == 5
+    [int(v) for v in lines]
+
+
+def test_stream_http_returns(filled, tmp_path):
+    # The feed runs beside the poll loop, so -n still ends the command
+    assert hlg1_cli.main(["-q", "-d", filled, "stream", "-n", "3", "--http", "0", "+",
+                          "readout", "--range", "1", "1", str(tmp_path / "out.txt")]) == 0
+    assert (tmp_path / "out.txt").exists()
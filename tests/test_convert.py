@@ -0,0 +1,94 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import json
+
+import numpy as np
+import pytest
+
+import capture_codec
+from convert import convert
+
+
+def _write(path, samples):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savetxt(path, samples, fmt="%d")
+
+
+def test_roots_with_same_file_names(tmp_path):
+    _write(tmp_path / "a" / "x.txt", [1, 2, 3])
+    _write(tmp_path / "b" / "x.txt", [4, 5])
+    out = tmp_path / "out"
+
+    stats = convert([str(tmp_path / "a"), str(tmp_path / "b")], str(out), workers=1)
+
+    assert stats["files"] == 2
+    assert list(capture_codec.load(str(out / "a" / "x.hlgc"))) == [1, 2, 3]
+    assert list(capture_codec.load(str(out / "b" / "x.hlgc"))) == [4, 5]
+    with open(out / "index.jsonl") as f:
+        assert sorted(json.loads(line)["source"] for line in f) == ["a/x.txt", "b/x.txt"]
+
+
+def test_colliding_outputs_refused(tmp_path):
+    _write(tmp_path / "one" / "data" / "x.txt", [1])
+    _write(tmp_path / "two" / "data" / "x.txt", [2])
+    out = tmp_path / "out"
+
+    with pytest.raises(ValueError):
+        convert([str(tmp_path / "one" / "data"), str(tmp_path / "two" / "data")],
+                str(out), workers=1)
+    assert not (out / "data").exists()
+
+
+def test_sidecar_schema_matches_readout(tmp_path):
+    from timebase import Capture, make_timebase, read_sidecar
+
+    src = tmp_path / "runs" / "run.txt"
+    src.parent.mkdir()
+    Capture(np.arange(100), make_timebase("2", 1, 10, 0, 100, 1.7e9)).save(str(src))
+    out = tmp_path / "out"
+
+    convert([str(tmp_path / "runs")], str(out), workers=1)
+
+    timebase, meta = read_sidecar(str(out / "runs" / "run.hlgc"))
+    assert timebase.to_dict() == read_sidecar(str(src))[0].to_dict()
+    assert meta["source"] == "runs/run.txt"
+    assert meta["recorded_from"] == "anchor"
+
+
+def test_resume_skips_converted_files(tmp_path):
+    for i in range(3):
+        _write(tmp_path / "runs" / f"{i}.txt", [i, i + 1])
+    out = tmp_path / "out"
+    roots = [str(tmp_path / "runs")]
+
+    assert convert(roots, str(out), workers=1)["files"] == 3
+
+    stats = convert(roots, str(out), workers=1)
+    assert (stats["files"], stats["skipped"]) == (0, 3)
+
+    # A changed source, a lost output and a torn index line are all redone
+    _write(tmp_path / "runs" / "0.txt", [7, 8, 9])
+    (out / "runs" / "1.hlgc").unlink()
+    with open(out / "index.jsonl", "a") as f:
+        f.write('{"source": "runs/2.t')
+
+    stats = convert(roots, str(out), workers=1)
+    assert (stats["files"], stats["skipped"]) == (2, 1)
+    assert list(capture_codec.load(str(out / "runs" / "0.hlgc"))) == [7, 8, 9]
+    assert list(capture_codec.load(str(out / "runs" / "1.hlgc"))) == [1, 2]
+
+
+def test_failed_file_retried(tmp_path):
+    src = tmp_path / "runs" / "bad.txt"
+    src.parent.mkdir()
+    src.write_text("1\nnot a number\n")
+    out = tmp_path / "out"
+
+    stats = convert([str(src.parent)], str(out), workers=1)
+    assert stats["failed"] == 1
+    assert not (out / "runs" / "bad.hlgc").exists()
+
+    _write(src, [1, 2])
+    stats = convert([str(src.parent)], str(out), workers=1)
+    assert (stats["files"], stats["failed"]) == (1, 0)
+    assert not (out / "runs" / "bad.hlgc.part").exists()
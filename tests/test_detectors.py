@@ -0,0 +1,108 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import numpy as np
+import pytest
+
+from detectors import Peak, Step, Threshold, Tolerance
+
+
+# Sample-by-sample reference implementations, as (index, value, info) tuples
+
+def naive_threshold(x, high, low):
+    events, above = [], None
+    for i, v in enumerate(x):
+        state = 1 if v >= high else 0 if v <= low else above
+        if above is not None and state != above:
+            events.append((i, v, {"edge": "rise" if state else "fall"}))
+        above = state
+    return events
+
+
+def naive_step(x, drift, threshold):
+    events, level, pos, neg = [], x[0], 0.0, 0.0
+    for i, v in enumerate(x):
+        pos = max(0.0, pos + v - level - drift)
+        neg = max(0.0, neg + level - v - drift)
+        if pos > threshold or neg > threshold:
+            events.append((i, v, {"direction": 1 if pos > threshold else -1, "level": level}))
+            level, pos, neg = v, 0.0, 0.0
+    return events
+
+
+def naive_peak(x, height, distance, mode):
+    events, slope, last_peak = [], 0, None
+    for i in range(1, len(x)):
+        d = int(np.sign(x[i] - x[i - 1]))
+        if d and slope and d != slope:
+            top = slope > 0
+            value = x[i - 1]
+            wanted = mode == "both" or (mode == "max") == top
+            if height is not None:
+                wanted = wanted and (value >= height if top else value <= height)
+            if wanted and (last_peak is None or i - 1 - last_peak >= distance):
+                last_peak = i - 1
+                events.append((i - 1, value, {"extreme": "max" if top else "min"}))
+        if d:
+            slope = d
+    return events
+
+
+def naive_tolerance(x, low, high, window):
+    events, inside = [], True
+    for i in range(window - 1, len(x)):
+        mean = sum(x[i - window + 1:i + 1]) / window
+        now = low <= mean <= high
+        if now != inside:
+            events.append((i, mean, {"edge": "enter" if now else "exit"}))
+        inside = now
+    return events
+
+
+def run_split(detector, x, rng):
+    """Events of detector fed x in blocks of random size, including empty ones"""
+    cuts = np.sort(rng.integers(0, len(x), 30))
+    events = []
+    for block in np.split(x, cuts):
+        events.extend(detector.process(block))
+    assert detector.count == len(x)
+    return [(e.index, e.value, e.info) for e in events]
+
+
+def _signal(seed):
+    rng = np.random.default_rng(seed)
+    # Random walk with plateaus and a few large steps
+    steps = rng.integers(-30, 31, 2000) * (rng.random(2000) < 0.7)
+    steps[rng.integers(0, 2000, 5)] += rng.choice([-5000, 5000], 5)
+    return np.cumsum(steps).astype(np.int32), rng
+
+
+SEEDS = range(5)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("high, low", [(0, 0), (200, -200)])
+def test_threshold(seed, high, low):
+    x, rng = _signal(seed)
+    assert run_split(Threshold(high, low), x, rng) == naive_threshold(x.tolist(), high, low)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_step(seed):
+    x, rng = _signal(seed)
+    assert run_split(Step(drift=20, threshold=3000), x, rng) == naive_step(x.tolist(), 20, 3000)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("height, distance, mode", [(None, 1, "max"), (0, 1, "min"), (None, 25, "both")])
+def test_peak(seed, height, distance, mode):
+    x, rng = _signal(seed)
+    assert (run_split(Peak(height, distance, mode), x, rng)
+            == naive_peak(x.tolist(), height, distance, mode))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("window", [1, 7, 64])
+def test_tolerance(seed, window):
+    x, rng = _signal(seed)
+    assert (run_split(Tolerance(-300, 300, window), x, rng)
+            == naive_tolerance(x.tolist(), -300, 300, window))
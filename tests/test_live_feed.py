@@ -0,0 +1,75 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import numpy as np
+import pytest
+
+from live_feed import FeedServer, LiveBuffer, downsample
+
+
+def test_live_buffer_keeps_order_across_wrap():
+    buf = LiveBuffer(capacity=5)
+    buf.write([1, 2, 3])
+    buf.write([4, 5, 6, 7])
+
+    y, count = buf.last(5)
+    assert count == 7
+    assert list(y) == [3, 4, 5, 6, 7]
+
+
+def test_live_buffer_counts_oversized_block():
+    buf = LiveBuffer(capacity=5)
+    buf.write(np.arange(10))
+    buf.write(np.arange(10, 13))
+    buf.write(np.arange(13, 21))
+
+    y, count = buf.last(5)
+    assert count == 21
+    assert list(y) == [16, 17, 18, 19, 20]
+
+
+@pytest.fixture
+def server():
+    live = LiveBuffer(capacity=100)
+    live.write(np.arange(50))
+    server = FeedServer(("127.0.0.1", 0), live, {"run": np.arange(1000)})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _get(server, path):
+    with urlopen(f"http://127.0.0.1:{server.server_address[1]}{path}") as r:
+        return r.headers, json.load(r)
+
+
+def test_capture_downsampled(server):
+    _, frame = _get(server, "/captures/run?width=100")
+    assert len(frame["x"]) <= 100
+
+
+def test_live_indexes(server):
+    headers, frame = _get(server, "/live?width=800&last=10")
+    assert frame["count"] == 50
+    assert frame["x"] == list(range(40, 50))
+    assert "Access-Control-Allow-Origin" not in headers
+
+
+@pytest.mark.parametrize("mode", ["lttb", "minmax"])
+@pytest.mark.parametrize("width", [1, 2, 3])
+def test_downsample_narrow(mode, width):
+    frame = downsample(np.arange(100), width, mode=mode)
+    assert 1 <= len(frame["x"]) <= width
+    assert frame["x"][0] == 0
+
+
+@pytest.mark.parametrize("path", ["/captures/run?width=0", "/live?width=-5", "/live/stream?width=0"])
+def test_bad_width_rejected(server, path):
+    with pytest.raises(HTTPError) as e:
+        _get(server, path)
+    assert e.value.code == 400
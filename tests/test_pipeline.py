@@ -0,0 +1,143 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import threading
+import time
+
+from HLG1 import HLG1, parse_data
+from hlg1_sim import SimulatedSerial
+from pipeline import BLOCK, SPILL, Pipeline, BoundedQueue, StageFailed
+
+
+def _filled_hlg():
+    hlg = HLG1(port=SimulatedSerial())
+    hlg.set_buffering_operation(True)
+    return hlg
+
+
+def _frames(hlg, n, size=100):
+    """Source returning n RLA replies of size samples each"""
+    it = iter(range(n))
+
+    def source():
+        i = next(it, None)
+        if i is None:
+            return None
+        start = (i * size) % 2900 + 1
+        return hlg.read_data_raw(start, start + size - 1)
+    return source
+
+
+class ListSink:
+
+    def __init__(self):
+        self.samples = []
+        self.closed = False
+
+    def write(self, samples):
+        self.samples.extend(samples)
+
+    def close(self):
+        self.closed = True
+
+
+class FailingSink(ListSink):
+
+    def write(self, samples):
+        raise RuntimeError("disk full")
+
+
+def test_pipeline_delivers_all_samples():
+    hlg = _filled_hlg()
+    sink = ListSink()
+    stats = Pipeline(_frames(hlg, 10), parse_data, [sink]).run()
+
+    assert len(sink.samples) == 1000
+    assert sink.samples[:100] == hlg.read_data(1, 100)
+    assert stats["decoder"]["samples"] == 1000
+    assert sink.closed
+
+
+def test_failing_sink_stops_pipeline():
+    hlg = _filled_hlg()
+    pipeline = Pipeline(_frames(hlg, 1000), parse_data, [FailingSink()],
+                        sink_queue=(4, BLOCK))
+
+    errors = []
+
+    def run():
+        try:
+            pipeline.run()
+        except Exception as e:
+            errors.append(e)
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    t.join(5)
+
+    assert not t.is_alive()
+    assert not pipeline.decoder.is_alive()
+    assert not pipeline.reader.is_alive()
+    assert len(errors) == 1 and isinstance(errors[0], RuntimeError)
+    assert pipeline.reader.frames < 1000
+
+
+def test_failed_queue_releases_blocked_put():
+    q = BoundedQueue(1, BLOCK)
+    q.put(1)
+
+    errors = []
+
+    def put():
+        try:
+            q.put(2)
+        except StageFailed as e:
+            errors.append(e)
+
+    t = threading.Thread(target=put, daemon=True)
+    t.start()
+    q.fail(RuntimeError("sink failed"))
+    t.join(5)
+
+    assert not t.is_alive()
+    assert isinstance(errors[0].error, RuntimeError)
+    assert q.depth() == 0
+
+
+def test_spill_keeps_order():
+    q = BoundedQueue(4, SPILL)
+    for i in range(1000):
+        q.put(i)
+    q.close()
+
+    deadline = time.monotonic() + 5
+    while not q.stats()["spilled"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert q.stats()["spilled"] > 0
+
+    out = []
+    while True:
+        try:
+            out.append(q.get(timeout=5))
+        except EOFError:
+            break
+    assert out == list(range(1000))
+
+
+def test_spill_put_never_waits_on_storage():
+    q = BoundedQueue(2, SPILL)
+    storage = threading.Event()
+    write = q._spill_write
+
+    def slow_write(items):
+        storage.wait()
+        write(items)
+    q._spill_write = slow_write
+
+    t = threading.Thread(target=lambda: [q.put(i) for i in range(100)], daemon=True)
+    t.start()
+    t.join(2)
+    assert not t.is_alive()
+
+    storage.set()
+    q.close()
+    assert [q.get(timeout=5) for _ in range(100)] == list(range(100))
@@ -0,0 +1,59 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import pytest
+
+from HLG1 import HLG1
+from hlg1_sim import SimulatedSerial
+from planner import BUFFER_SIZE, apply_plan, plan_capture
+
+
+def test_window_around_trigger():
+    # 200 us cycle, 2 ms resolution: every 10th sample, 25 before the trigger
+    plan = plan_capture(-0.05, 0.2, 0.002, 230400, "0")
+    assert (plan.rate, plan.trigger_point, plan.amount, plan.delay) == (10, 26, 126, 0)
+    assert plan.pretrigger_time == pytest.approx(0.05)
+    assert plan.capture_time == pytest.approx(0.2)
+
+    times = plan.timebase().times()
+    assert times[0] == pytest.approx(-0.05)
+    assert times[plan.trigger_point - 1] == pytest.approx(0.0)
+    assert times[-1] == pytest.approx(0.2)
+
+
+def test_window_after_trigger_uses_delay():
+    plan = plan_capture(0.1, 0.3, 0.001, 230400, "2")
+    assert (plan.rate, plan.trigger_point, plan.delay, plan.amount) == (1, 1, 100, 201)
+
+    times = plan.timebase().times()
+    assert times[0] == pytest.approx(0.1)
+    assert times[-1] == pytest.approx(0.3)
+
+
+def test_readout_time_scales_with_baud():
+    slow = plan_capture(-0.05, 0.2, 0.002, 9600, "0")
+    fast = plan_capture(-0.05, 0.2, 0.002, 115200, "0")
+    assert slow.readout_time == pytest.approx(12 * fast.readout_time)
+
+
+@pytest.mark.parametrize("start, end, resolution, cycle", [
+    (0.2, 0.1, 0.001, "2"),         # empty window
+    (0.0, 1.0, 1e-4, "2"),          # finer than the sampling cycle
+    (0.0, 10.0, 0.001, "2"),        # more than the buffer holds
+    (0.0, 1.0, 0.001, "7"),         # unknown cycle
+])
+def test_invalid(start, end, resolution, cycle):
+    with pytest.raises(ValueError):
+        plan_capture(start, end, resolution, 230400, cycle)
+
+
+def test_largest_window():
+    plan = plan_capture(0.0, (BUFFER_SIZE - 1) * 0.001, 0.001, 230400, "2")
+    assert plan.amount == BUFFER_SIZE
+
+
+def test_apply_plan():
+    sim = SimulatedSerial()
+    plan = plan_capture(-0.05, 0.2, 0.002, 230400, "0")
+    apply_plan(HLG1(port=sim), plan)
+
+    assert sim.registers["BC"] == plan.amount
@@ -0,0 +1,44 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import threading
+
+import pytest
+
+from HLG1 import HLG1
+from hlg1_sim import SimulatedSerial
+from planner import apply_plan, plan_capture
+from scheduler import ScheduledHLG1
+
+
+@pytest.fixture
+def scheduled():
+    sim = SimulatedSerial()
+    hlg = ScheduledHLG1(HLG1(port=sim))
+    yield hlg, sim
+    hlg.close()
+
+
+def test_apply_plan_through_scheduler(scheduled):
+    hlg, sim = scheduled
+    plan = plan_capture(-0.05, 0.2, 1e-3, 230400, "2")
+
+    t = threading.Thread(target=apply_plan, args=(hlg, plan), daemon=True)
+    t.start()
+    t.join(5)
+
+    assert not t.is_alive()
+    assert sim.registers["BC"] == plan.amount
+    assert sim.registers["TP"] == plan.trigger_point
+    assert sim.registers["BS"] == 1
+
+
+def test_batch_runs_as_one_job(scheduled):
+    hlg, sim = scheduled
+    assert hlg.batch(lambda h: (h.set_trigger_point(42), h.get_trigger_point())[1]) == 42
+
+
+def test_lock_not_exposed(scheduled):
+    hlg, _ = scheduled
+    with pytest.raises(AttributeError):
+        hlg.lock
+    assert hlg.get_trigger_point() == 300
@@ -0,0 +1,69 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import json
+
+import numpy as np
+import pytest
+
+from timebase import Capture, Timebase, make_timebase, read_sidecar, write_sidecar
+
+
+def test_make_timebase():
+    # 1 ms cycle, every 2nd sample stored, trigger at sample 11, 5 cycles late
+    tb = make_timebase("2", 2, 11, 5, 100, anchor=1000.0)
+    assert tb.step == pytest.approx(2e-3)
+    assert tb.start == pytest.approx(1000.0 + 5e-3 - 10 * 2e-3)
+    # The trigger sample sits at the anchor plus the trigger delay
+    assert tb.times()[10] == pytest.approx(1000.005)
+    assert tb.end == pytest.approx(tb.start + 99 * 2e-3)
+
+
+def test_make_timebase_relative_and_rate_zero():
+    tb = make_timebase("0", 0, 1, 0, 10)
+    assert tb.start == 0.0
+    assert tb.step == pytest.approx(200e-6)
+    with pytest.raises(ValueError):
+        make_timebase("9", 1, 1, 0, 10)
+
+
+def test_index_slice_round_trip():
+    tb = Timebase(-0.05, 0.002, 126)
+    t = tb.times()
+    np.testing.assert_allclose(tb.index(t), np.arange(126), atol=1e-9)
+
+    part = tb.slice(25, 30)
+    assert len(part) == 5
+    np.testing.assert_allclose(part.times(), t[25:30])
+    assert len(tb.slice(120, 200)) == 6
+    assert len(tb.slice(130, 140)) == 0
+
+
+def test_resample_outside_is_nan():
+    cap = Capture([0, 10, 20], Timebase(1.0, 0.5, 3))
+    y = cap.resample([0.9, 1.25, 2.0, 2.1])
+    assert np.isnan(y[0]) and np.isnan(y[3])
+    assert list(y[1:3]) == [5.0, 20.0]
+
+
+def test_sidecar(tmp_path):
+    path = str(tmp_path / "run.txt")
+    write_sidecar(path, Timebase(1.5, 0.001, 10, 2.0), source="x")
+    with open(path + ".json") as f:
+        assert json.load(f) == {"source": "x", "start": 1.5, "step": 0.001, "n": 10, "anchor": 2.0}
+
+    timebase, meta = read_sidecar(path)
+    assert timebase.to_dict() == {"start": 1.5, "step": 0.001, "n": 10, "anchor": 2.0}
+    assert meta == {"source": "x"}
+
+    write_sidecar(path, source="y")
+    assert read_sidecar(path) == (None, {"source": "y"})
+
+
+def test_sidecar_legacy_nested(tmp_path):
+    path = str(tmp_path / "run.hlgc")
+    with open(path + ".json", "w") as f:
+        json.dump({"source": "x", "timebase": {"start": 0.0, "step": 0.5, "n": 4}}, f)
+
+    timebase, meta = read_sidecar(path)
+    assert (timebase.step, timebase.n, timebase.anchor) == (0.5, 4, None)
+    assert meta == {"source": "x"}
@@ -0,0 +1,46 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import pytest
+
+from HLG1 import HLG1
+
+
+def test_tcp_readout(endpoint):
+    with HLG1(endpoint) as hlg:
+        hlg.set_buffering_operation(True)
+        assert len(hlg.read_data()) == 3000
+
+
+def test_connection_reused_after_close(endpoint):
+    hlg = HLG1(endpoint)
+    conn = hlg.serial
+    hlg.close()
+
+    with HLG1(endpoint) as hlg:
+        assert hlg.serial is conn
+        assert hlg.get_trigger_point() == 300
+
+
+def test_second_session_gets_own_connection(endpoint):
+    first = HLG1(endpoint)
+    second = HLG1(endpoint)
+
+    assert second.serial is not first.serial
+    assert first.get_trigger_point() == second.get_trigger_point() == 300
+
+    pooled = first.serial
+    second.close()
+    first.close()
+    with HLG1(endpoint) as hlg:
+        assert hlg.serial is pooled
+
+
+def test_connection_discarded_after_error(endpoint):
+    with pytest.raises(RuntimeError):
+        with HLG1(endpoint) as hlg:
+            conn = hlg.serial
+            raise RuntimeError("readout interrupted")
+
+    with HLG1(endpoint) as hlg:
+        assert hlg.serial is not conn
+        assert hlg.get_trigger_point() == 300
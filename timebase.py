@@ -0,0 +1,224 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Capture Timebase
+Reconstructs per-sample timestamps for buffered captures from the device
+settings and a host-clock anchor taken at the trigger
+
+Sample i (0-based) of a capture was taken at
+    start + i * step
+with
+    step  = sampling cycle * buffer rate
+    start = anchor + trigger delay * sampling cycle - (trigger point - 1) * step
+
+Trigger delay is counted in sampling cycles. Without an anchor the times are
+relative to the trigger (anchor = 0).
+
+Capture sidecar: every capture file (text or .hlgc) may have a <capture>.json
+next to it, written by write_sidecar(), holding one JSON object with
+    start, step, n, anchor   the Timebase fields, when the timebase is known
+    any other key            metadata, e.g. source, recorded, recorded_from
+so Timebase.from_dict() reads it directly when the timebase is present.
+"""
+
+import json
+import time
+
+import numpy as np
+
+SAMPLING_CYCLES = {
+    "0": 200e-6,
+    "1": 500e-6,
+    "2": 1e-3,
+    "3": 2e-3,
+}
+
+
+class Timebase:
+    """Evenly spaced time axis stored as start + step"""
+
+    def __init__(self, start, step, n, anchor=None):
+        self.start = float(start)
+        self.step = float(step)
+        self.n = int(n)
+        self.anchor = anchor
+
+    def __len__(self):
+        return self.n
+
+    def __repr__(self):
+        return f"Timebase(start={self.start!r}, step={self.step!r}, n={self.n})"
+
+    @property
+    def end(self):
+        """Time of the last sample"""
+        return self.start + (self.n - 1) * self.step
+
+    def times(self, start=0, end=None):
+        """Timestamps of samples start..end-1"""
+        end = self.n if end is None else min(end, self.n)
+        return self.start + np.arange(start, end, dtype=np.float64) * self.step
+
+    def index(self, t):
+        """Fractional sample index at time(s) t"""
+        return (np.asarray(t, dtype=np.float64) - self.start) / self.step
+
+    def slice(self, start, end):
+        """Timebase of samples start..end-1 (0-based)"""
+        end = min(end, self.n)
+        return Timebase(self.start + start * self.step, self.step, max(0, end - start), self.anchor)
+
+    def to_dict(self):
+        return {"start": self.start, "step": self.step, "n": self.n, "anchor": self.anchor}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["start"], d["step"], d["n"], d.get("anchor"))
+
+
+class Capture:
+    """Buffered samples together with their timebase"""
+
+    def __init__(self, samples, timebase):
+        self.samples = np.asarray(samples, dtype=np.int32)
+        self.timebase = timebase
+
+        if len(self.samples) != len(timebase):
+            raise ValueError("timebase length does not match samples")
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def times(self):
+        return self.timebase.times()
+
+    def resample(self, times):
+        """Linearly interpolated values at times; NaN outside the capture"""
+        return np.interp(self.timebase.index(times),
+                         np.arange(len(self.samples)),
+                         self.samples.astype(np.float64),
+                         left=np.nan, right=np.nan)
+
+    def save(self, path):
+        """Write samples one per line plus a <path>.json sidecar"""
+        np.savetxt(path, self.samples, fmt="%d")
+        write_sidecar(path, self.timebase)
+
+    @classmethod
+    def load(cls, path):
+        samples = np.loadtxt(path, dtype=np.int32, ndmin=1)
+        timebase, _ = read_sidecar(path)
+        if timebase is None:
+            raise ValueError(path + ".json has no timebase")
+        return cls(samples, timebase)
+
+
+_TIMEBASE_KEYS = ("start", "step", "n", "anchor")
+
+
+def write_sidecar(path, timebase=None, **meta):
+    """Write the <path>.json sidecar of capture path (see module docstring)"""
+    d = dict(meta)
+    if timebase is not None:
+        d.update(timebase.to_dict())
+    with open(path + ".json", "w") as f:
+        json.dump(d, f)
+
+
+def read_sidecar(path):
+    """(Timebase or None, metadata dict) from the <path>.json sidecar of capture path"""
+    with open(path + ".json") as f:
+        d = json.load(f)
+
+    # Early bulk conversions nested the timebase
+    if isinstance(d.get("timebase"), dict):
+        d.update(d.pop("timebase"))
+
+    timebase = Timebase.from_dict(d) if all(k in d for k in ("start", "step", "n")) else None
+    meta = {k: v for k, v in d.items() if k not in _TIMEBASE_KEYS}
+    return timebase, meta
+
+
+def make_timebase(sampling_cycle, buffer_rate, trigger_point, trigger_delay, n, anchor=None):
+    """
+    Build a Timebase from device settings
+    Args:
+        sampling_cycle: code returned by get_sampling_cycle() ("0".."3")
+        buffer_rate:    get_buffer_rate(), store every n-th sample
+        trigger_point:  get_trigger_point(), 1-based buffer index of the trigger
+        trigger_delay:  get_trigger_delay(), in sampling cycles
+        n:              number of samples in the capture
+        anchor:         host time of the trigger (default: times relative to trigger)
+    """
+    if sampling_cycle not in SAMPLING_CYCLES:
+        raise ValueError("Unknown sampling cycle " + repr(sampling_cycle))
+
+    cycle = SAMPLING_CYCLES[sampling_cycle]
+    step = cycle * max(buffer_rate, 1)
+    start = (anchor or 0.0) + trigger_delay * cycle - (trigger_point - 1) * step
+
+    return Timebase(start, step, n, anchor)
+
+
+def read_timebase(hlg, n, anchor=None):
+    """Query the settings of hlg and build a Timebase for n samples"""
+    return make_timebase(hlg.get_sampling_cycle(),
+                         hlg.get_buffer_rate(),
+                         hlg.get_trigger_point(),
+                         hlg.get_trigger_delay(),
+                         n, anchor)
+
+
+def read_capture(hlg, anchor=None):
+    """read_data() with a reconstructed timebase"""
+    samples = hlg.read_data()
+    if samples is None:
+        return
+
+    return Capture(samples, read_timebase(hlg, len(samples), anchor))
+
+
+def wait_for_trigger(hlg, poll=0.001, timeout=None):
+    """
+    Poll get_buffering_status() until it leaves "wait for trigger"
+    Returns the host time of the transition, estimated as the midpoint
+    between the last waiting and the first triggered reply
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    before = time.time()
+
+    while True:
+        status = hlg.get_buffering_status()
+        now = time.time()
+        if status in ("2", "3"):
+            return (before + now) / 2
+        if deadline is not None and now > deadline:
+            raise TimeoutError("no trigger within " + str(timeout) + " s")
+        before = now
+        time.sleep(poll)
+
+
+def common_grid(captures, step=None):
+    """
+    Time grid covering the overlap of all captures
+    The step defaults to the coarsest capture step
+    """
+    start = max(c.timebase.start for c in captures)
+    end = min(c.timebase.end for c in captures)
+    if end < start:
+        raise ValueError("captures do not overlap in time")
+
+    if step is None:
+        step = max(c.timebase.step for c in captures)
+
+    return Timebase(start, step, int(np.floor((end - start) / step + 1e-9)) + 1)
+
+
+def align(captures, step=None):
+    """
+    Resample captures onto their common time grid
+    Returns (Timebase, 2-D array with one row per capture)
+    """
+    grid = common_grid(captures, step)
+    times = grid.times()
+    return grid, np.vstack([c.resample(times) for c in captures])
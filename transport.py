@@ -0,0 +1,244 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+HL-G1 Transports
+Connections to the sensor, chosen by the endpoint given as serial_device:
+
+    /dev/ttyUSB0, COM4          local serial port (pyserial)
+    tcp://host:port             raw TCP socket to a serial device server
+    rfc2217://host:port         RFC 2217 (telnet COM port control) device server
+
+Every transport offers the subset of the pyserial API that HLG1 uses: write,
+read, read_until, reset_input_buffer, close and name. Network transports use
+TCP_NODELAY, keepalive and large socket buffers, so short commands are not
+held back by Nagle and bulk RLA replies arrive in few large reads.
+
+Connections are reused through a pool keyed by endpoint: HLG1.close() hands
+the connection back and the next HLG1 on the same endpoint picks it up. A
+second HLG1 opened while the first is still in use gets its own connection.
+"""
+
+import logging
+import select
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+SOCKET_BUFFER = 256 * 1024
+RECV_SIZE = 65536
+
+
+def _tune(sock):
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER)
+
+
+def _host_port(endpoint):
+    url = urlparse(endpoint)
+    if not url.hostname or not url.port:
+        raise ValueError("endpoint needs host and port: " + endpoint)
+    return url.hostname, url.port
+
+
+class TcpTransport:
+    """Raw TCP connection to a serial device server"""
+
+    def __init__(self, endpoint, timeout=1):
+        self.name = endpoint
+        self.timeout = timeout
+        self.sock = socket.create_connection(_host_port(endpoint), timeout=timeout)
+        _tune(self.sock)
+        self._buf = bytearray()
+
+    def write(self, data):
+        self.sock.sendall(data)
+        return len(data)
+
+    def _fill(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        self.sock.settimeout(remaining)
+        try:
+            chunk = self.sock.recv(RECV_SIZE)
+        except socket.timeout:
+            return False
+        if not chunk:
+            raise ConnectionError(self.name + " closed the connection")
+        self._buf += chunk
+        return True
+
+    def read(self, size=1):
+        deadline = time.monotonic() + self.timeout
+        while len(self._buf) < size and self._fill(deadline):
+            pass
+        data = bytes(self._buf[:size])
+        del self._buf[:size]
+        return data
+
+    def read_until(self, expected=b"\r", size=None):
+        deadline = time.monotonic() + self.timeout
+        start = 0
+        while True:
+            i = self._buf.find(expected, start)
+            if i >= 0:
+                end = i + len(expected)
+                break
+            if size is not None and len(self._buf) >= size:
+                end = size
+                break
+            start = max(0, len(self._buf) - len(expected) + 1)
+            if not self._fill(deadline):
+                end = len(self._buf)
+                break
+
+        if size is not None:
+            end = min(end, size)
+        data = bytes(self._buf[:end])
+        del self._buf[:end]
+        return data
+
+    def reset_input_buffer(self):
+        self._buf.clear()
+        self.sock.setblocking(False)
+        try:
+            while self.sock.recv(RECV_SIZE):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        finally:
+            self.sock.setblocking(True)
+
+    def alive(self):
+        """False if the peer closed the connection"""
+        readable, _, _ = select.select([self.sock], [], [], 0)
+        if not readable:
+            return True
+        try:
+            return bool(self.sock.recv(RECV_SIZE, socket.MSG_PEEK))
+        except OSError:
+            return False
+
+    def close(self):
+        self.sock.close()
+
+
+def open_serial(endpoint, baud, timeout=1):
+    """Local serial port, or any URL pyserial's serial_for_url understands"""
+    import serial
+    return serial.serial_for_url(endpoint, baud, timeout=timeout)
+
+
+def open_rfc2217(endpoint, baud, timeout=1):
+    import serial
+    port = serial.serial_for_url(endpoint, baud, timeout=timeout)
+    # pyserial keeps the socket in a private attribute; without it the
+    # connection works, just untuned
+    sock = getattr(port, "_socket", None)
+    if isinstance(sock, socket.socket):
+        _tune(sock)
+    else:
+        logging.debug("Cannot tune " + endpoint + ", pyserial has no _socket")
+    return port
+
+
+def open_transport(endpoint, baud=230400, timeout=1):
+    """Open a new connection for endpoint (see module docstring)"""
+    scheme = urlparse(endpoint).scheme
+    if scheme in ("tcp", "socket"):
+        return TcpTransport(endpoint, timeout)
+    if scheme == "rfc2217":
+        return open_rfc2217(endpoint, baud, timeout)
+    return open_serial(endpoint, baud, timeout)
+
+
+class TransportPool:
+    """
+    Keeps connections open between sessions, one per (endpoint, baud)
+    The pooled connection is handed to one user at a time; while it is out,
+    acquire() opens extra connections that are closed on release. Idle ones
+    are closed after max_idle seconds.
+    """
+
+    def __init__(self, max_idle=300):
+        self.max_idle = max_idle
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.busy = {}
+        self._reserved = object()
+
+    def acquire(self, endpoint, baud=230400, timeout=1):
+        key = (endpoint, baud)
+        with self.lock:
+            if key in self.busy:
+                pooled = False
+                conn = None
+            else:
+                pooled = True
+                self._expire()
+                conn, _ = self.idle.pop(key, (None, None))
+                self.busy[key] = self._reserved
+
+        if not pooled:
+            logging.debug(endpoint + " is in use, opening an extra connection")
+            return open_transport(endpoint, baud, timeout)
+
+        try:
+            if conn is not None and _alive(conn):
+                conn.reset_input_buffer()
+                logging.debug("Reusing connection to " + endpoint)
+            else:
+                if conn is not None:
+                    conn.close()
+                conn = open_transport(endpoint, baud, timeout)
+        except Exception:
+            with self.lock:
+                del self.busy[key]
+            raise
+
+        with self.lock:
+            self.busy[key] = conn
+        return conn
+
+    def release(self, endpoint, baud, conn):
+        """Return conn for reuse; extra connections are closed"""
+        key = (endpoint, baud)
+        with self.lock:
+            pooled = self.busy.get(key) is conn
+            if pooled:
+                del self.busy[key]
+                self.idle[key] = (conn, time.monotonic())
+        if not pooled:
+            conn.close()
+
+    def discard(self, endpoint, baud, conn):
+        """Close a connection instead of returning it, e.g. after an I/O error"""
+        key = (endpoint, baud)
+        with self.lock:
+            if self.busy.get(key) is conn:
+                del self.busy[key]
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for conn, _ in idle.values():
+            conn.close()
+
+    def _expire(self):
+        now = time.monotonic()
+        for key, (conn, since) in list(self.idle.items()):
+            if now - since > self.max_idle:
+                del self.idle[key]
+                conn.close()
+
+
+def _alive(conn):
+    if hasattr(conn, "alive"):
+        return conn.alive()
+    return getattr(conn, "is_open", True)
+
+
+POOL = TransportPool()